@@ -1,5 +1,124 @@
 Certainly! I'll provide you with 20 advanced examples of using Python for file and directory operations, including recursive searches, renaming, and more. I'll use inline comments to explain each example in detail.
 
+    Shared helpers: directory walker built on os.scandir, atomic writes (used by every example below):
+
+python
+
+import os
+import re
+import errno
+import shutil
+import fnmatch
+import tempfile
+from contextlib import contextmanager, suppress
+
+def compile_globs(patterns):
+    # Fold several glob patterns into one compiled regex so each name is matched once
+    if not patterns:
+        return None
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    return re.compile("|".join(fnmatch.translate(p) for p in patterns)).match
+
+def scan_dir(path):
+    # One getdents pass per directory; DirEntry carries d_type and caches stat() after the first call
+    try:
+        with os.scandir(path) as it:
+            return list(it)  # Snapshot the listing so callers can rename/move while iterating
+    except OSError:
+        return []  # Unreadable or vanished directory: skip it, like os.walk does by default
+
+def scan_tree(root_dir, include=None, exclude=None, exclude_dirs=None,
+              files=True, dirs=False, recursive=True, follow_symlinks=False):
+    include_match = compile_globs(include)  # Only yield files whose name matches
+    exclude_match = compile_globs(exclude)  # Never yield files whose name matches
+    prune_match = compile_globs(exclude_dirs)  # Never descend into directories whose name matches
+    stack = [os.fspath(root_dir)]
+    while stack:  # Explicit stack instead of recursion
+        subdirs = []
+        for entry in scan_dir(stack.pop()):
+            if entry.is_dir(follow_symlinks=follow_symlinks):  # d_type answers this without a stat
+                if prune_match and prune_match(entry.name):
+                    continue  # Prune the whole subtree
+                subdirs.append(entry.path)
+                if dirs:
+                    yield entry
+            elif files and entry.is_file():
+                if include_match and not include_match(entry.name):
+                    continue
+                if exclude_match and exclude_match(entry.name):
+                    continue
+                yield entry  # entry.stat() is cached, so each inode is stat'ed at most once
+        if recursive:
+            stack.extend(reversed(subdirs))  # Keep the listing order when popping
+
+UMASK = os.umask(0)  # Read once: os.umask() can only be queried by setting it, which races with threads
+os.umask(UMASK)
+
+@contextmanager
+def atomic_writer(path, mode='wb', encoding=None, errors=None, newline=None):
+    # Write next to the target, fsync, then rename over it: readers see the old or the new
+    # file, never a half-written one, and a crash leaves the original untouched
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=encoding, errors=errors, newline=newline) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            shutil.copymode(path, tmp_path)  # Keep the original permission bits
+        except FileNotFoundError:
+            os.chmod(tmp_path, 0o666 & ~UMASK)  # New file: what open() would give, not mkstemp's 0600
+        os.replace(tmp_path, path)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.unlink(tmp_path)
+        raise
+
+# Errors meaning "this filesystem has no hardlinks", not "the target exists"
+LINK_UNSUPPORTED_ERRNOS = {errno.EPERM, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EMLINK, errno.ENOSYS}
+
+def rename_no_clobber(src_path, dst_path):
+    # os.rename silently replaces an existing target; link + unlink fails with EEXIST instead,
+    # atomically. Where hardlinks are unavailable, fall back to an existence check first.
+    try:
+        os.link(src_path, dst_path, follow_symlinks=False)
+    except OSError as e:
+        if e.errno not in LINK_UNSUPPORTED_ERRNOS:
+            raise  # FileExistsError, EXDEV, ...
+        if os.path.lexists(dst_path):
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), dst_path)
+        os.rename(src_path, dst_path)
+        return
+    os.unlink(src_path)
+
+def copy_file_atomic(src_path, dst_path, copy_function=shutil.copy2, replace=True):
+    # Copy next to the destination and rename over it, so an interrupted copy never leaves
+    # a truncated file under the real name. replace=False raises FileExistsError rather than
+    # overwrite a target that appeared meanwhile.
+    directory, name = os.path.split(dst_path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        copy_function(src_path, tmp_path)  # Copy with metadata
+        if replace:
+            os.replace(tmp_path, dst_path)
+        else:
+            rename_no_clobber(tmp_path, dst_path)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.unlink(tmp_path)
+        raise
+
+# Example usage
+for entry in scan_tree("/path/to/search", include=["*.py"], exclude_dirs=[".git", "__pycache__"]):
+    print(entry.path, entry.stat().st_size)
+
+with atomic_writer("/path/to/settings.json", 'w') as f:  # Old or new contents, never half of each
+    f.write("{}")
+copy_file_atomic("/path/to/report.csv", "/mnt/share/report.csv", replace=False)  # FileExistsError if taken
+
     Recursive search for files with a specific extension:
 
 python
@@ -7,10 +126,9 @@ python
 import os
 
 def find_files_with_extension(root_dir, extension):
-    for root, dirs, files in os.walk(root_dir):  # Walk through directory tree
-        for file in files:
-            if file.endswith(extension):  # Check if file has the desired extension
-                yield os.path.join(root, file)  # Yield full path of matching file
+    # Let the walker filter by name, so non-matching files are never stat'ed
+    for entry in scan_tree(root_dir, include=f"*{extension}"):
+        yield entry.path  # Yield full path of matching file
 
 # Example usage
 for file_path in find_files_with_extension("/path/to/search", ".txt"):
@@ -24,13 +142,18 @@ import os
 import re
 
 def rename_files_with_pattern(directory, pattern, replacement):
-    for filename in os.listdir(directory):
-        if os.path.isfile(os.path.join(directory, filename)):
-            new_name = re.sub(pattern, replacement, filename)  # Replace pattern in filename
-            if new_name != filename:
-                os.rename(os.path.join(directory, filename),
-                          os.path.join(directory, new_name))
-                print(f"Renamed: {filename} -> {new_name}")
+    compiled_pattern = re.compile(pattern)
+    entries = scan_dir(directory)  # One listing gives both the files and every taken name
+    mapping = {}
+    for entry in entries:
+        if entry.is_file():  # Files only, d_type answers is-file
+            new_name = compiled_pattern.sub(replacement, entry.name)  # Replace pattern in filename
+            if new_name != entry.name:
+                mapping[entry.name] = new_name
+    # Planned and journaled as one batch (see bulk_rename below): a collision aborts it up front
+    bulk_rename(directory, mapping, {entry.name for entry in entries})
+    for filename, new_name in mapping.items():
+        print(f"Renamed: {filename} -> {new_name}")
 
 # Example usage
 rename_files_with_pattern("/path/to/directory", r"(\d{4})_(\d{2})_(\d{2})", r"\3-\2-\1")
@@ -40,27 +163,463 @@ rename_files_with_pattern("/path/to/directory", r"(\d{4})_(\d{2})_(\d{2})", r"\3
 python
 
 import os
+import time
 import hashlib
-
-def find_duplicates(directory):
-    hash_dict = {}
-    for root, dirs, files in os.walk(directory):
-        for filename in files:
-            filepath = os.path.join(root, filename)
-            file_hash = hashlib.md5(open(filepath, 'rb').read()).hexdigest()  # Calculate file hash
-            if file_hash in hash_dict:
-                hash_dict[file_hash].append(filepath)
-            else:
-                hash_dict[file_hash] = [filepath]
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+
+EDGE_SIZE = 64 * 1024  # Bytes hashed from each end of a file in the cheap stage
+CHUNK_SIZE = 1024 * 1024  # Fixed read size for full hashes, so memory never grows with file size
+
+@dataclass
+class DuplicateScanStats:
+    files_scanned: int = 0
+    bytes_scanned: int = 0  # Total size of every file the walk saw
+    size_stage_skipped: int = 0  # Bytes never read because the file's size was unique
+    edge_stage_read: int = 0  # Bytes read to hash the first/last EDGE_SIZE bytes
+    edge_stage_skipped: int = 0  # Bytes never read because the edge hash was unique
+    full_stage_read: int = 0  # Bytes read by full-content hashes
+    unreadable: int = 0  # Files that vanished or could not be opened
+
+def hash_file(path, algorithm="md5", chunk_size=CHUNK_SIZE):
+    # Hash the whole file with one reusable buffer instead of read() of the entire file
+    digest = hashlib.new(algorithm)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while n := f.readinto(buffer):
+            digest.update(view[:n])
+    return digest.hexdigest()
+
+def hash_edges(path, size, algorithm="md5", edge_size=EDGE_SIZE):
+    # Head and tail are where most same-size files differ (headers, trailers, appended data)
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        digest.update(f.read(edge_size))
+        f.seek(size - edge_size)
+        digest.update(f.read(edge_size))
+    return digest.hexdigest()
+
+def _hash_job(job, algorithm):
+    path, size, edges_only = job
+    try:
+        return hash_edges(path, size, algorithm) if edges_only else hash_file(path, algorithm)
+    except OSError:
+        return None  # Vanished or unreadable; the caller counts it
+
+def hash_many(jobs, algorithm="md5", workers=1, use_processes=False):
+    # jobs are (path, size, edges_only) tuples; digests come back in job order, so the
+    # result is the same whatever the degree of parallelism
+    hash_job = partial(_hash_job, algorithm=algorithm)
+    if workers <= 1:
+        return [hash_job(job) for job in jobs]
+    # hashlib releases the GIL while hashing large buffers, so threads scale on fast disks;
+    # processes help when the hash itself is the bottleneck (e.g. sha1 on small files)
+    if use_processes:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(hash_job, jobs, chunksize=32))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(hash_job, jobs))
+
+def find_duplicate_groups(entries, stats=None, algorithm="md5", workers=1, use_processes=False,
+                          cache=None):
+    stats = stats if stats is not None else DuplicateScanStats()
+    
+    def hash_all(group):
+        jobs = [(entry.path, size, edges_only) for entry, size, edges_only in group]
+        if cache is None:
+            return hash_many(jobs, algorithm, workers, use_processes)
+        # Digests of unchanged files come from the cache; only misses are read
+        file_stats = [entry.stat() for entry, _, _ in group]
+        return cache.hash_many(jobs, file_stats, algorithm, workers, use_processes)
+    
+    # Stage 1: group by size (free, it comes from the walker's cached stat)
+    by_size = defaultdict(list)
+    for entry in entries:
+        size = entry.stat().st_size
+        by_size[size].append(entry)
+        stats.files_scanned += 1
+        stats.bytes_scanned += size
+    
+    # Stage 2: a unique size cannot have a duplicate; hash only the edges of the rest
+    group = []
+    for size, same_size in by_size.items():
+        if len(same_size) < 2:
+            stats.size_stage_skipped += size
+            continue
+        # When the edges cover the whole file, the edge pass already is the final hash
+        group.extend((entry, size, size > 2 * EDGE_SIZE) for entry in same_size)
+    
+    hash_dict = defaultdict(list)
+    by_edges = defaultdict(list)
+    for (entry, size, edges_only), digest in zip(group, hash_all(group)):
+        if digest is None:
+            stats.unreadable += 1
+        elif edges_only:
+            by_edges[size, digest].append(entry)
+            stats.edge_stage_read += 2 * EDGE_SIZE
+        else:
+            hash_dict[digest].append(entry.path)
+            stats.edge_stage_read += size
+    
+    # Stage 3: full chunked hash only for files that still share size and edges
+    group = []
+    for (size, _), same_edges in by_edges.items():
+        if len(same_edges) < 2:
+            stats.edge_stage_skipped += size - 2 * EDGE_SIZE
+            continue
+        group.extend((entry, size, False) for entry in same_edges)
+    
+    for (entry, size, _), digest in zip(group, hash_all(group)):
+        if digest is None:
+            stats.unreadable += 1
+        else:
+            hash_dict[digest].append(entry.path)
+            stats.full_stage_read += size
     
     return {k: v for k, v in hash_dict.items() if len(v) > 1}  # Return only duplicates
 
+def find_duplicates(directory, stats=None, algorithm="md5", workers=1, use_processes=False,
+                    cache=None):
+    duplicates = find_duplicate_groups(scan_tree(directory), stats, algorithm, workers,
+                                       use_processes, cache)
+    if cache is not None:
+        cache.evict_missing(directory)  # Forget files that disappeared since the last run
+    return duplicates
+
+def benchmark_hashing(directory, algorithm="md5", max_workers=None, use_processes=False):
+    # Full-hash every file with 1, 2, 4, ... workers and report throughput for each.
+    # Run it twice: the first pass warms the page cache, the second measures hashing, not the disk.
+    jobs = [(entry.path, entry.stat().st_size, False) for entry in scan_tree(directory)]
+    total_bytes = sum(size for _, size, _ in jobs)
+    max_workers = max_workers or os.cpu_count()
+    results = []
+    workers = 1
+    while True:
+        start = time.perf_counter()
+        hash_many(jobs, algorithm, workers, use_processes)
+        elapsed = time.perf_counter() - start
+        results.append((workers, elapsed, total_bytes / elapsed / 1024 / 1024 if elapsed else 0.0))
+        if workers >= max_workers:
+            return results
+        workers = min(workers * 2, max_workers)
+
 # Example usage
-duplicates = find_duplicates("/path/to/search")
+stats = DuplicateScanStats()
+duplicates = find_duplicates("/path/to/search", stats, algorithm="blake2b", workers=8)
 for hash_value, file_list in duplicates.items():
     print(f"Duplicate files (hash: {hash_value}):")
     for file in file_list:
         print(f"  {file}")
+print(f"Skipped {stats.size_stage_skipped} bytes by size, {stats.edge_stage_skipped} bytes by edges; "
+      f"read {stats.edge_stage_read + stats.full_stage_read} of {stats.bytes_scanned} bytes")
+
+for workers, seconds, mb_per_s in benchmark_hashing("/path/to/search", "blake2b"):
+    print(f"{workers:3d} workers: {seconds:.2f}s  {mb_per_s:.0f} MB/s")
+
+    Persistent hash cache keyed on inode metadata:
+
+python
+
+import os
+import sqlite3
+
+class HashCache:
+    # A digest stays valid while (st_dev, st_ino, st_size, st_mtime_ns) is unchanged, so reruns
+    # over a mostly unchanged tree only read the files that changed.
+    # Use it from one thread; hash_many() does its lookups before handing misses to the pool.
+    
+    def __init__(self, db_path="file-hashes.sqlite"):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")  # Cheap commits, readers don't block
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS hashes (
+                dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER,
+                algorithm TEXT, kind TEXT, digest TEXT, path TEXT,
+                PRIMARY KEY (dev, ino, algorithm, kind)
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS hashes_path ON hashes (path)")
+        self.hits = 0
+        self.misses = 0
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+    
+    def get(self, path, st, algorithm="md5", kind="full"):
+        path = os.path.abspath(path)
+        row = self.conn.execute(
+            "SELECT digest, path FROM hashes WHERE dev=? AND ino=? AND algorithm=? AND kind=?"
+            " AND size=? AND mtime_ns=?",
+            (st.st_dev, st.st_ino, algorithm, kind, st.st_size, st.st_mtime_ns)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if row[1] != path:  # Same inode under a new name (rename or hardlink): follow it
+            self.conn.execute("UPDATE hashes SET path=? WHERE dev=? AND ino=?",
+                              (path, st.st_dev, st.st_ino))
+        return row[0]
+    
+    def put(self, path, st, digest, algorithm="md5", kind="full"):
+        # REPLACE drops the stale row of a file that changed since it was cached
+        self.conn.execute("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                          (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns,
+                           algorithm, kind, digest, os.path.abspath(path)))
+    
+    def digest(self, path, st=None, algorithm="md5"):
+        # Full-content digest of one file, read from disk only on a cache miss
+        st = st if st is not None else os.stat(path)
+        digest = self.get(path, st, algorithm)
+        if digest is None:
+            digest = hash_file(path, algorithm)
+            self.put(path, st, digest, algorithm)
+        return digest
+    
+    def hash_many(self, jobs, file_stats, algorithm="md5", workers=1, use_processes=False):
+        # Same jobs as the module-level hash_many(), plus the stat of each file for the key
+        kinds = ["edge" if edges_only else "full" for _, _, edges_only in jobs]
+        digests = [self.get(job[0], st, algorithm, kind)
+                   for job, st, kind in zip(jobs, file_stats, kinds)]
+        misses = [i for i, digest in enumerate(digests) if digest is None]
+        fresh = hash_many([jobs[i] for i in misses], algorithm, workers, use_processes)
+        for i, digest in zip(misses, fresh):
+            digests[i] = digest
+            if digest is not None:
+                self.put(jobs[i][0], file_stats[i], digest, algorithm, kinds[i])
+        self.conn.commit()
+        return digests
+    
+    def evict_missing(self, root_dir=None):
+        # Drop rows whose file is gone or whose path now names a different inode
+        if root_dir is None:
+            rows = self.conn.execute("SELECT path, dev, ino FROM hashes").fetchall()
+        else:
+            prefix = os.path.join(os.path.abspath(root_dir), "")
+            rows = self.conn.execute(  # Range scan on the path index instead of LIKE
+                "SELECT path, dev, ino FROM hashes WHERE path >= ? AND path < ?",
+                (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1))).fetchall()
+        stale = []
+        for path, dev, ino in rows:
+            try:
+                st = os.stat(path)
+            except OSError:
+                stale.append((dev, ino))
+                continue
+            if (st.st_dev, st.st_ino) != (dev, ino):
+                stale.append((dev, ino))
+        self.conn.executemany("DELETE FROM hashes WHERE dev=? AND ino=?", stale)
+        self.conn.commit()
+        return len(stale)
+
+# Example usage: a nightly dedupe only reads files whose inode, size or mtime changed
+with HashCache("/var/cache/dedupe/hashes.sqlite") as cache:
+    duplicates = find_duplicates("/path/to/archive", algorithm="blake2b", workers=8, cache=cache)
+    print(f"{len(duplicates)} duplicate groups, {cache.hits} cached digests, {cache.misses} hashed")
+
+    Zero-copy file copy backend (copy_file_range, sendfile, readinto):
+
+python
+
+import os
+import time
+import errno
+import shutil
+
+COPY_CHUNK_SIZE = 8 * 1024 * 1024  # Bytes per syscall; also the readinto buffer size
+COPY_BACKENDS = ("copy_file_range", "sendfile", "readinto")
+# Errors meaning "this backend can't handle these two files", not "the copy failed"
+UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF,
+                      errno.ETXTBSY, errno.EPERM}
+
+def data_extents(fd, size):
+    # (offset, length) of each data region; holes of sparse files are skipped, not copied as zeros
+    if not hasattr(os, "SEEK_DATA"):
+        yield 0, size
+        return
+    offset = 0
+    while offset < size:
+        try:
+            start = os.lseek(fd, offset, os.SEEK_DATA)
+        except OSError as e:
+            if e.errno == errno.ENXIO:
+                return  # Only a hole is left
+            yield offset, size - offset  # Filesystem can't report holes: treat the rest as data
+            return
+        end = min(os.lseek(fd, start, os.SEEK_HOLE), size)
+        yield start, end - start
+        offset = end
+
+def copy_extent(backend, src_fd, dst_fd, offset, length, buffer):
+    # Copy one data region with the given backend; returns the number of bytes copied
+    done = 0
+    if backend == "copy_file_range":  # In-kernel, and a reflink/server-side copy where supported
+        while done < length:
+            n = os.copy_file_range(src_fd, dst_fd, length - done, offset + done, offset + done)
+            if n == 0:
+                break  # Source shrank
+            done += n
+    elif backend == "sendfile":  # In-kernel page-cache to file; writes at dst's file position
+        os.lseek(dst_fd, offset, os.SEEK_SET)
+        while done < length:
+            n = os.sendfile(dst_fd, src_fd, offset + done, length - done)
+            if n == 0:
+                break
+            done += n
+    else:  # One reusable buffer: no per-chunk allocations, unlike read()/write()
+        view = memoryview(buffer)
+        os.lseek(src_fd, offset, os.SEEK_SET)
+        os.lseek(dst_fd, offset, os.SEEK_SET)
+        while done < length:
+            n = os.readv(src_fd, [view[:min(len(view), length - done)]])
+            if n == 0:
+                break
+            written = 0
+            while written < n:
+                written += os.write(dst_fd, view[written:n])
+            done += n
+    return done
+
+def fast_copyfile(src_path, dst_path, backend=None):
+    # Copy file data through the fastest backend that works for this pair of files, falling back
+    # copy_file_range -> sendfile -> readinto; pass backend to force one. Returns the backend used.
+    backends = COPY_BACKENDS if backend is None else (backend,)
+    backends = [name for name in backends if name == "readinto" or hasattr(os, name)]
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        src_fd, dst_fd = src.fileno(), dst.fileno()
+        size = os.fstat(src_fd).st_size
+        buffer = bytearray(COPY_CHUNK_SIZE) if backends == ["readinto"] else None
+        used = backends[0]
+        for offset, length in data_extents(src_fd, size):
+            for chunk_offset in range(offset, offset + length, COPY_CHUNK_SIZE):
+                chunk = min(COPY_CHUNK_SIZE, offset + length - chunk_offset)
+                while True:
+                    try:
+                        copy_extent(used, src_fd, dst_fd, chunk_offset, chunk, buffer)
+                        break
+                    except OSError as e:
+                        if e.errno not in UNSUPPORTED_ERRNOS or used == backends[-1]:
+                            raise
+                        # Writes are positional, so the next backend just redoes this chunk
+                        used = backends[backends.index(used) + 1]
+                        if used == "readinto" and buffer is None:
+                            buffer = bytearray(COPY_CHUNK_SIZE)
+        os.ftruncate(dst_fd, size)  # Extends over a trailing hole without writing it
+    return used
+
+def fast_copy2(src_path, dst_path, backend=None):
+    # Drop-in for shutil.copy2 (and shutil.move's copy_function): data plus metadata
+    if os.path.isdir(dst_path):
+        dst_path = os.path.join(dst_path, os.path.basename(src_path))
+    fast_copyfile(src_path, dst_path, backend)
+    shutil.copystat(src_path, dst_path)
+    return dst_path
+
+def benchmark_copy(src_path, dst_dir, repeat=3):
+    # Wall time, throughput and CPU time (user + system) of shutil.copyfile and of each backend.
+    # Copy to another filesystem to see the cross-device case that shutil.move falls into.
+    size = os.path.getsize(src_path)
+    dst_path = os.path.join(dst_dir, f".copybench.{os.getpid()}")
+    candidates = [("shutil", shutil.copyfile)] + [
+        (name, lambda src, dst, name=name: fast_copyfile(src, dst, name))
+        for name in COPY_BACKENDS if name == "readinto" or hasattr(os, name)]
+    results = []
+    try:
+        for name, copy in candidates:
+            best_wall = best_cpu = float("inf")
+            for _ in range(repeat):
+                before, start = os.times(), time.perf_counter()
+                copy(src_path, dst_path)
+                wall, after = time.perf_counter() - start, os.times()
+                os.remove(dst_path)  # Every run writes a fresh file, as a real copy would
+                best_wall = min(best_wall, wall)
+                best_cpu = min(best_cpu, (after.user - before.user) + (after.system - before.system))
+            results.append((name, best_wall, size / best_wall / 1024 / 1024 if best_wall else 0.0, best_cpu))
+    finally:
+        if os.path.exists(dst_path):
+            os.remove(dst_path)
+    return results
+
+# Example usage
+for name, seconds, mb_per_s, cpu_seconds in benchmark_copy("/path/to/big.iso", "/mnt/other_disk"):
+    print(f"{name:>16}: {seconds:.2f}s  {mb_per_s:.0f} MB/s  {cpu_seconds:.2f}s CPU")
+
+    Batched move executor (snapshot, cached mkdirs, rename or parallel copy):
+
+python
+
+import os
+import errno
+import shutil
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+def move_files(moves, copy_function=shutil.copy2, workers=4):
+    # moves: (src_path, dst_path) pairs, listed in full before the first move, so files the
+    # executor has just moved are never walked again. Same-filesystem moves are one link + unlink;
+    # EXDEV ones are copied (temp name, then linked into place) and unlinked on a thread pool.
+    # A destination is never replaced: one that already exists, or that another source in the
+    # batch has taken, counts as a conflict. Returns counts instead of printing every file.
+    moves = list(moves)
+    counts = Counter()
+    created = set()  # Destination directories already made: one makedirs per directory
+    claimed = {dst_path for src_path, dst_path in moves if src_path == dst_path}  # Files already in place
+    cross_device = []
+    for src_path, dst_path in moves:
+        if src_path == dst_path:
+            counts["skipped"] += 1  # Already where it belongs
+            continue
+        if dst_path in claimed:
+            counts["conflicts"] += 1  # Two sources, one target: the first one wins
+            continue
+        claimed.add(dst_path)
+        parent = os.path.dirname(dst_path)
+        if parent not in created:
+            os.makedirs(parent, exist_ok=True)
+            created.add(parent)
+        try:
+            rename_no_clobber(src_path, dst_path)
+            counts["renamed"] += 1
+        except OSError as e:
+            if e.errno == errno.EXDEV:
+                cross_device.append((src_path, dst_path))
+            elif e.errno == errno.EEXIST:
+                counts["conflicts"] += 1  # Target exists outside the batch: leave both files alone
+            else:
+                counts["failed"] += 1
+    
+    def copy_and_unlink(move):
+        src_path, dst_path = move
+        try:
+            if os.path.lexists(dst_path):  # Don't copy just to find the target taken
+                return "conflicts", 0
+            size = os.stat(src_path).st_size
+            copy_file_atomic(src_path, dst_path, copy_function, replace=False)
+            os.unlink(src_path)  # Only once the complete copy is in place
+            return "copied", size
+        except FileExistsError:
+            return "conflicts", 0
+        except OSError:
+            return "failed", 0
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for outcome, size in pool.map(copy_and_unlink, cross_device):
+            counts[outcome] += 1
+            if outcome == "copied":
+                counts["bytes_copied"] += size
+    return counts
+
+# Example usage
+print(move_files([("/path/to/a.log", "/mnt/archive/a.log"), ("/path/to/b.log", "/path/to/old/b.log")]))
 
     Move files older than a certain date:
 
@@ -70,20 +629,17 @@ import os
 import shutil
 from datetime import datetime, timedelta
 
-def move_old_files(source_dir, destination_dir, days_old):
-    cutoff_date = datetime.now() - timedelta(days=days_old)
-    for root, dirs, files in os.walk(source_dir):
-        for file in files:
-            file_path = os.path.join(root, file)
-            if datetime.fromtimestamp(os.path.getmtime(file_path)) < cutoff_date:
-                relative_path = os.path.relpath(root, source_dir)
-                dest_path = os.path.join(destination_dir, relative_path)
-                os.makedirs(dest_path, exist_ok=True)
-                shutil.move(file_path, os.path.join(dest_path, file))
-                print(f"Moved: {file_path} -> {os.path.join(dest_path, file)}")
+def move_old_files(source_dir, destination_dir, days_old, copy_function=shutil.copy2, workers=4):
+    cutoff = (datetime.now() - timedelta(days=days_old)).timestamp()
+    moves = [(entry.path, os.path.join(destination_dir, os.path.relpath(entry.path, source_dir)))
+             for entry in scan_tree(source_dir)
+             if entry.stat().st_mtime < cutoff]  # Cached stat from the walk
+    # copy_function only runs for cross-device moves; fast_copy2 keeps those in the kernel
+    return move_files(moves, copy_function, workers)
 
 # Example usage
-move_old_files("/path/to/source", "/path/to/destination", 30)
+print(move_old_files("/path/to/source", "/path/to/destination", 30))
+print(move_old_files("/path/to/source", "/mnt/archive", 30, copy_function=fast_copy2, workers=8))
 
     Create a directory structure based on file extensions:
 
@@ -92,19 +648,17 @@ python
 import os
 import shutil
 
-def organize_by_extension(source_dir):
-    for root, dirs, files in os.walk(source_dir):
-        for file in files:
-            file_path = os.path.join(root, file)
-            file_extension = os.path.splitext(file)[1][1:]  # Get extension without dot
-            if file_extension:
-                dest_dir = os.path.join(source_dir, file_extension)
-                os.makedirs(dest_dir, exist_ok=True)
-                shutil.move(file_path, os.path.join(dest_dir, file))
-                print(f"Moved: {file_path} -> {os.path.join(dest_dir, file)}")
+def organize_by_extension(source_dir, copy_function=shutil.copy2, workers=4):
+    moves = []
+    for entry in scan_tree(source_dir):  # The whole listing is taken before anything moves
+        file = entry.name
+        file_extension = os.path.splitext(file)[1][1:]  # Get extension without dot
+        if file_extension:
+            moves.append((entry.path, os.path.join(source_dir, file_extension, file)))
+    return move_files(moves, copy_function, workers)
 
 # Example usage
-organize_by_extension("/path/to/organize")
+print(organize_by_extension("/path/to/organize"))
 
     Find and delete empty directories:
 
@@ -112,17 +666,209 @@ python
 
 import os
 
+DIR_FD_SUPPORTED = ({os.open, os.rmdir} <= os.supports_dir_fd and os.scandir in os.supports_fd
+                    and hasattr(os, "O_DIRECTORY"))
+
+def list_subdirs(dir_fd):
+    # Subdirectory names, plus how many other entries (files, symlinks, ...) the directory holds
+    subdirs, others = [], 0
+    try:
+        with os.scandir(dir_fd) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):  # d_type, no stat
+                    subdirs.append(entry.name)
+                else:
+                    others += 1
+    except OSError:
+        others += 1  # Unreadable: treat it as not empty
+    return subdirs, others
+
+def remove_empty_dirs(directory):
+    # Post-order walk with one scandir per directory. Each stack frame counts the entries that
+    # stay ("kept"); a finished directory with nothing kept is removed with rmdir relative to its
+    # parent's fd, otherwise it counts as kept in the parent. Yields each removed path.
+    root = os.fspath(directory)
+    if not DIR_FD_SUPPORTED:  # No dir_fd (e.g. Windows): children-first rmdir by path
+        for entry in reversed(list(scan_tree(root, files=False, dirs=True))):
+            try:
+                os.rmdir(entry.path)  # rmdir itself refuses non-empty directories
+                yield entry.path
+            except OSError:
+                pass
+        return
+    flags = os.O_RDONLY | os.O_DIRECTORY | getattr(os, "O_NOFOLLOW", 0)
+    root_fd = os.open(root, flags)
+    subdirs, kept = list_subdirs(root_fd)
+    stack = [[root, "", root_fd, iter(subdirs), kept]]  # path, name, fd, subdirs left, kept
+    try:
+        while stack:
+            frame = stack[-1]
+            name = next(frame[3], None)
+            if name is not None:
+                try:
+                    fd = os.open(name, flags, dir_fd=frame[2])  # O_NOFOLLOW: never leave the tree
+                except OSError:
+                    frame[4] += 1
+                    continue
+                subdirs, kept = list_subdirs(fd)
+                stack.append([os.path.join(frame[0], name), name, fd, iter(subdirs), kept])
+                continue
+            path, name, fd, _, kept = stack.pop()
+            os.close(fd)
+            if not stack:
+                break  # The root itself is never removed
+            parent = stack[-1]
+            if kept == 0:
+                try:
+                    os.rmdir(name, dir_fd=parent[2])
+                    yield path
+                    continue
+                except OSError:
+                    pass  # Something appeared meanwhile, or no permission
+            parent[4] += 1
+    finally:
+        for frame in stack:  # Closed early or failed: release the remaining fds
+            os.close(frame[2])
+
 def delete_empty_dirs(directory):
-    for root, dirs, files in os.walk(directory, topdown=False):  # Walk bottom-up
-        for dir_name in dirs:
-            dir_path = os.path.join(root, dir_name)
-            if not os.listdir(dir_path):  # Check if directory is empty
-                os.rmdir(dir_path)
-                print(f"Deleted empty directory: {dir_path}")
+    removed = 0
+    for dir_path in remove_empty_dirs(directory):
+        removed += 1
+        print(f"Deleted empty directory: {dir_path}")
+    return removed
 
 # Example usage
 delete_empty_dirs("/path/to/clean")
 
+    Journaled bulk rename planner (collisions, cycles, crash recovery):
+
+python
+
+import os
+import json
+from collections import deque
+
+RENAME_JOURNAL = ".rename-journal"  # Lives in the renamed directory until the batch completes
+
+def plan_renames(mapping, existing):
+    # mapping: old name -> new name within one directory; existing: every name in it.
+    # Returns (src, dst) steps in a safe order: a rename runs only once its target is free,
+    # and cycles (a -> b -> a) are broken by parking one member under a temporary name.
+    pending = {src: dst for src, dst in mapping.items() if src != dst}
+    targets = {}
+    for src, dst in pending.items():
+        if dst in targets:
+            raise ValueError(f"{targets[dst]!r} and {src!r} would both be renamed to {dst!r}")
+        targets[dst] = src
+        if dst in existing and dst not in pending:
+            raise FileExistsError(f"Renaming {src!r} would overwrite {dst!r}")
+    
+    waiting_on = {dst: src for src, dst in pending.items() if dst in pending}  # name -> who wants it
+    ready = deque(src for src, dst in pending.items() if dst not in pending)
+    steps = []
+    
+    def drain():
+        while ready:
+            src = ready.popleft()
+            steps.append((src, pending.pop(src)))
+            waiter = waiting_on.pop(src, None)  # src's old name is free now
+            if waiter is not None:
+                ready.append(waiter)
+    
+    drain()
+    temp_count = 0
+    while pending:  # Whatever is left forms cycles
+        src = next(iter(pending))
+        while True:
+            temp = f".rename-{os.getpid()}-{temp_count}.tmp"
+            temp_count += 1
+            if temp not in existing and temp not in targets:
+                break
+        steps.append((src, temp))
+        dst = pending.pop(src)
+        pending[temp] = dst  # Finish the move from the temporary name later
+        waiting_on[dst] = temp
+        ready.append(waiting_on.pop(src))  # Its predecessor in the cycle can move now
+        drain()
+    return steps
+
+def journal_renames(directory, steps):
+    # The plan goes to disk (fsynced) before anything is renamed; each finished step then
+    # appends its index. A crash leaves enough to roll the batch forward or back.
+    journal_path = os.path.join(directory, RENAME_JOURNAL)
+    with open(journal_path, 'x') as f:  # Exclusive create: one batch per directory at a time
+        f.write(json.dumps({"steps": steps}) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    return journal_path
+
+def run_renames(directory, steps, first=0, journal=True):
+    # Renames relative to one directory fd: no path resolution per file, and no stat at all
+    use_fd = os.rename in os.supports_dir_fd and hasattr(os, "O_DIRECTORY")
+    dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY) if use_fd else None
+    journal_path = os.path.join(directory, RENAME_JOURNAL)
+    log = open(journal_path, 'a', buffering=1) if journal else None  # Line-buffered: one write() per step
+    try:
+        for i in range(first, len(steps)):
+            src, dst = steps[i]
+            if use_fd:
+                os.rename(src, dst, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+            else:
+                os.rename(os.path.join(directory, src), os.path.join(directory, dst))
+            if log:
+                log.write(f"{i}\n")
+    finally:
+        if log:
+            log.close()
+        if dir_fd is not None:
+            os.close(dir_fd)
+    if journal:
+        os.remove(journal_path)  # The batch is complete
+
+def read_journal(directory):
+    # (steps, index of the last logged step or -1); a torn last line is ignored
+    with open(os.path.join(directory, RENAME_JOURNAL)) as f:
+        steps = [tuple(step) for step in json.loads(f.readline())["steps"]]
+        done = -1
+        for line in f:
+            if line.endswith("\n"):
+                done = int(line)
+    return steps, done
+
+def recover_renames(directory, roll_back=False):
+    # Finish (default) or undo a batch interrupted by a crash. The step after the last logged
+    # one may have run without being logged; its source gone and target present tells.
+    if not os.path.exists(os.path.join(directory, RENAME_JOURNAL)):
+        return None  # Nothing to recover
+    steps, done = read_journal(directory)
+    if done + 1 < len(steps):
+        src, dst = steps[done + 1]
+        if not os.path.lexists(os.path.join(directory, src)) and os.path.lexists(os.path.join(directory, dst)):
+            done += 1
+    if roll_back:
+        undo = [(dst, src) for src, dst in reversed(steps[:done + 1])]
+        run_renames(directory, undo, journal=False)
+    else:
+        run_renames(directory, steps, first=done + 1, journal=False)
+    os.remove(os.path.join(directory, RENAME_JOURNAL))
+    return "rolled back" if roll_back else "rolled forward"
+
+def bulk_rename(directory, mapping, existing=None):
+    # Plan everything first, so a collision aborts the batch before any file is touched
+    if existing is None:
+        existing = {entry.name for entry in scan_dir(directory)}
+    if RENAME_JOURNAL in existing:
+        raise FileExistsError(f"Unfinished rename batch in {directory}; run recover_renames() first")
+    steps = plan_renames(mapping, existing)
+    if steps:
+        journal_renames(directory, steps)
+        run_renames(directory, steps)
+    return len(steps)
+
+# Example usage: swapping two names needs a temporary name, which the planner adds
+bulk_rename("/path/to/directory", {"a.jpg": "b.jpg", "b.jpg": "a.jpg"})
+recover_renames("/path/to/directory")  # After a crash: finish the interrupted batch
+
     Batch rename files with incrementing numbers:
 
 python
@@ -130,12 +876,17 @@ python
 import os
 
 def batch_rename(directory, prefix, start_num=1, padding=3):
-    files = sorted(os.listdir(directory))
-    for i, filename in enumerate(files, start=start_num):
-        file_extension = os.path.splitext(filename)[1]
-        new_name = f"{prefix}{str(i).zfill(padding)}{file_extension}"
-        os.rename(os.path.join(directory, filename),
-                  os.path.join(directory, new_name))
+    listing = scan_dir(directory)
+    entries = sorted((entry for entry in listing if entry.is_dir(follow_symlinks=False) or entry.is_file()),
+                     key=lambda e: e.name)
+    mapping = {}
+    for i, entry in enumerate(entries, start=start_num):
+        file_extension = os.path.splitext(entry.name)[1]
+        mapping[entry.name] = f"{prefix}{str(i).zfill(padding)}{file_extension}"
+    # file_002 -> file_001 while file_001 still waits its turn is ordered (or cycled through a
+    # temporary name) by the planner instead of clobbering it
+    bulk_rename(directory, mapping, {entry.name for entry in listing})
+    for filename, new_name in mapping.items():
         print(f"Renamed: {filename} -> {new_name}")
 
 # Example usage
@@ -146,40 +897,424 @@ batch_rename("/path/to/rename", "file_", start_num=1, padding=3)
 python
 
 import os
-
-def search_file_content(directory, search_text):
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            file_path = os.path.join(root, file)
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    if search_text in f.read():
-                        yield file_path
-            except (IOError, UnicodeDecodeError):
-                pass  # Skip files that can't be read or aren't text
+import re
+import mmap
+from collections import namedtuple
+
+BINARY_SNIFF_SIZE = 8192  # A NUL byte in the first block marks the file as binary
+NEWLINE_BLOCK = 1024 * 1024  # Newlines are counted in slices of this size
+
+SearchHit = namedtuple("SearchHit", "path line offset pattern")
+
+def compile_patterns(patterns):
+    # One alternation over all needles: a single pass over the bytes finds any of them.
+    # Longest needles first, so "foobar" is reported rather than its prefix "foo".
+    if isinstance(patterns, (str, bytes)):
+        patterns = [patterns]
+    needles = {p.encode('utf-8') if isinstance(p, str) else p for p in patterns}
+    return re.compile(b"|".join(re.escape(n) for n in sorted(needles, key=len, reverse=True)))
+
+def count_newlines(buffer, start, end):
+    # Bounded-size slices, so the copy never grows with the distance between matches
+    return sum(buffer[i:min(i + NEWLINE_BLOCK, end)].count(b"\n")
+               for i in range(start, end, NEWLINE_BLOCK))
+
+def search_mapped_file(file_path, matcher):
+    try:
+        with open(file_path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)  # Pages are read on demand
+    except (OSError, ValueError):
+        return  # Unreadable, or empty (an empty file cannot be mapped and cannot match)
+    with mm:
+        if b"\0" in mm[:BINARY_SNIFF_SIZE]:
+            return  # Binary file: give up after the first block instead of after reading it all
+        if hasattr(mm, "madvise"):
+            mm.madvise(mmap.MADV_SEQUENTIAL)  # Aggressive readahead, early reclaim of seen pages
+        line, last = 1, 0
+        for match in matcher.finditer(mm):
+            offset = match.start()
+            line += count_newlines(mm, last, offset)
+            last = offset
+            yield SearchHit(file_path, line, offset, match.group())
+
+def search_file_matches(directory, patterns, include=None):
+    matcher = compile_patterns(patterns)
+    for entry in scan_tree(directory, include=include):
+        yield from search_mapped_file(entry.path, matcher)
+
+def search_file_content(directory, search_text, index=None):
+    matcher = compile_patterns(search_text)  # A string or a list of strings
+    if index is not None:
+        # Only files whose trigrams could contain a needle; hits are still verified below
+        candidates = index.candidates(directory, search_text)
+    else:
+        candidates = (entry.path for entry in scan_tree(directory))
+    for file_path in candidates:
+        # Stop at the first hit; the rest of the file is never paged in
+        if next(search_mapped_file(file_path, matcher), None) is not None:
+            yield file_path
 
 # Example usage
 for file_path in search_file_content("/path/to/search", "specific text"):
     print(f"Found in: {file_path}")
 
+for path, line, offset, pattern in search_file_matches("/path/to/search", ["TODO", "FIXME"], "*.py"):
+    print(f"{path}:{line} (byte {offset}): {pattern.decode()}")
+
+    Trigram index for repeated content searches:
+
+python
+
+import os
+import time
+import sqlite3
+
+MAX_INDEXED_SIZE = 4 * 1024 * 1024  # Larger files are not indexed and always searched
+
+def file_trigrams(file_path, max_size=MAX_INDEXED_SIZE):
+    # Set of 3-byte sequences as 24-bit integers; None means "too big, search it every time"
+    with open(file_path, 'rb') as f:
+        data = f.read(max_size + 1)
+    if len(data) > max_size:
+        return None
+    if b"\0" in data[:BINARY_SNIFF_SIZE]:
+        return set()  # Binary files are never search hits, so they get no postings at all
+    return {a << 16 | b << 8 | c for a, b, c in set(zip(data, data[1:], data[2:]))}
+
+def needle_trigrams(needle):
+    data = needle.encode('utf-8') if isinstance(needle, str) else needle
+    return {a << 16 | b << 8 | c for a, b, c in zip(data, data[1:], data[2:])}
+
+class TrigramIndex:
+    # Posting lists of trigram -> files, kept in SQLite next to each file's size and mtime.
+    # update() re-reads only new or modified files; candidates() narrows a query to the files
+    # that contain every trigram of a needle, and search_file_content() verifies those.
+    
+    def __init__(self, db_path="trigrams.sqlite", max_size=MAX_INDEXED_SIZE):
+        self.max_size = max_size
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY, path TEXT UNIQUE, size INTEGER, mtime_ns INTEGER,
+                indexed INTEGER  -- 0: too large to index, always a candidate
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                trigram INTEGER, file_id INTEGER, PRIMARY KEY (trigram, file_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_file ON postings (file_id);
+        """)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+    
+    def _under(self, directory):
+        # Path range covering everything below directory (uses the UNIQUE index on path)
+        prefix = os.path.join(os.path.abspath(directory), "")
+        return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    
+    def update(self, directory):
+        # One walk; files whose size and mtime are unchanged are not opened
+        known = {path: (file_id, size, mtime_ns) for file_id, path, size, mtime_ns in
+                 self.conn.execute("SELECT id, path, size, mtime_ns FROM files"
+                                   " WHERE path >= ? AND path < ?", self._under(directory))}
+        changed = 0
+        for entry in scan_tree(os.path.abspath(directory)):
+            st = entry.stat()
+            row = known.pop(entry.path, None)
+            if row is not None and row[1:] == (st.st_size, st.st_mtime_ns):
+                continue
+            try:
+                trigrams = file_trigrams(entry.path, self.max_size)
+            except OSError:
+                continue
+            if row is not None:
+                self._remove(row[0])
+            file_id = self.conn.execute(
+                "INSERT INTO files (path, size, mtime_ns, indexed) VALUES (?, ?, ?, ?)",
+                (entry.path, st.st_size, st.st_mtime_ns, trigrams is not None)).lastrowid
+            self.conn.executemany("INSERT INTO postings VALUES (?, ?)",
+                                  ((trigram, file_id) for trigram in trigrams or ()))
+            changed += 1
+        for file_id, _, _ in known.values():  # Not seen by the walk: deleted since last update
+            self._remove(file_id)
+        self.conn.commit()
+        return changed, len(known)
+    
+    def _remove(self, file_id):
+        self.conn.execute("DELETE FROM postings WHERE file_id = ?", (file_id,))
+        self.conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+    
+    def candidates(self, directory, needles):
+        if isinstance(needles, (str, bytes)):
+            needles = [needles]
+        under = self._under(directory)
+        paths = set()
+        for needle in needles:
+            # A subset of the trigrams still gives a superset of the hits; capping them keeps
+            # long needles under SQLite's limit on compound SELECTs
+            trigrams = sorted(needle_trigrams(needle))[:64]
+            if not trigrams:  # Shorter than three bytes: the index cannot narrow it down
+                query, params = "SELECT path FROM files WHERE path >= ? AND path < ?", under
+            else:
+                # Files holding every trigram of the needle, plus the unindexed (too large) ones
+                postings = " INTERSECT ".join(["SELECT file_id FROM postings WHERE trigram = ?"]
+                                              * len(trigrams))
+                query = (f"SELECT path FROM files WHERE path >= ? AND path < ? AND"
+                         f" (indexed = 0 OR id IN ({postings}))")
+                params = (*under, *trigrams)
+            paths.update(path for path, in self.conn.execute(query, params))
+        return sorted(paths)
+
+def benchmark_search(directory, search_text, index, repeat=5):
+    # Average latency of an unindexed query (full walk + scan) and an indexed one
+    timings = {}
+    for label, idx in (("unindexed", None), ("indexed", index)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            hits = list(search_file_content(directory, search_text, index=idx))
+        timings[label] = ((time.perf_counter() - start) / repeat, len(hits))
+    return timings
+
+# Example usage: refresh the index (only changed files are read), then query through it
+with TrigramIndex("/var/cache/search/config-trigrams.sqlite") as index:
+    changed, removed = index.update("/path/to/configs")
+    print(f"Reindexed {changed} files, dropped {removed}")
+    for file_path in search_file_content("/path/to/configs", "max_connections", index=index):
+        print(f"Found in: {file_path}")
+    for label, (seconds, hits) in benchmark_search("/path/to/configs", "max_connections", index).items():
+        print(f"{label:>9}: {seconds * 1000:.1f} ms per query, {hits} hits")
+
     Create a zip archive of a directory:
 
 python
 
 import os
+import json
+import time
+import zlib
+import struct
+import shutil
 import zipfile
-
-def zip_directory(directory, zip_name):
-    with zipfile.ZipFile(zip_name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for root, dirs, files in os.walk(directory):
-            for file in files:
-                file_path = os.path.join(root, file)
-                arcname = os.path.relpath(file_path, directory)
-                zipf.write(file_path, arcname)
-                print(f"Added to zip: {file_path}")
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Deflating these again burns CPU for (almost) no gain, so they are stored as-is
+STORED_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic",
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".7z", ".rar",
+    ".mp4", ".mkv", ".mov", ".webm", ".mp3", ".ogg", ".flac",
+}
+DEFLATE_CHUNK_SIZE = 1024 * 1024
+INLINE_LIMIT = 1024 * 1024  # Compressed members above this are handed back via a spool file
+
+def compress_type_for(path):
+    if os.path.splitext(path)[1].lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+def zip_info_for(arcname, st, compress_type):
+    # Same fields ZipInfo.from_file() fills in, but from a stat we already have
+    zinfo = zipfile.ZipInfo(arcname, time.localtime(st.st_mtime)[:6])
+    zinfo.external_attr = (st.st_mode & 0xFFFF) << 16
+    zinfo.file_size = st.st_size
+    zinfo.compress_type = compress_type
+    return zinfo
+
+def deflate_member(file_path, level, spool_dir, spool_prefix="tmp"):
+    # Runs in a worker process: raw deflate (what zipfile uses) plus CRC in one read.
+    # Small results travel back inline; big ones through a temp file, so memory stays bounded.
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    crc = 0
+    parts, size = [], 0
+    spool = None
+    with open(file_path, 'rb') as src:
+        while chunk := src.read(DEFLATE_CHUNK_SIZE):
+            crc = zlib.crc32(chunk, crc)
+            parts.append(compressor.compress(chunk))
+            size += len(parts[-1])
+            if spool is None and size > INLINE_LIMIT:
+                spool = tempfile.NamedTemporaryFile(dir=spool_dir, prefix=spool_prefix, suffix=".deflate",
+                                                    delete=False)
+            if spool is not None:
+                spool.writelines(parts)
+                parts = []
+        parts.append(compressor.flush())
+    if spool is None:
+        return crc, b"".join(parts), None
+    with spool:
+        spool.writelines(parts)
+    return crc, None, spool.name
+
+def write_raw_member(zipf, zinfo, crc, compress_size, write_payload):
+    # Append already-compressed bytes, following the same steps as ZipFile.open(..., 'w')
+    zinfo.CRC = crc
+    zinfo.compress_size = compress_size
+    zinfo.flag_bits = 0
+    zip64 = zinfo.file_size * 1.05 > zipfile.ZIP64_LIMIT  # Same rule as zipfile itself
+    zipf.fp.seek(zipf.start_dir)
+    zinfo.header_offset = zipf.fp.tell()
+    zipf._writecheck(zinfo)
+    zipf._didModify = True
+    zipf.fp.write(zinfo.FileHeader(zip64))
+    write_payload(zipf.fp)
+    zipf.start_dir = zipf.fp.tell()
+    zipf.filelist.append(zinfo)
+    zipf.NameToInfo[zinfo.filename] = zinfo
+
+def write_deflated_member(zipf, zinfo, crc, data, spool_path):
+    if spool_path is None:
+        write_raw_member(zipf, zinfo, crc, len(data), lambda fp: fp.write(data))
+        return
+    with open(spool_path, 'rb') as spool:
+        write_raw_member(zipf, zinfo, crc, os.path.getsize(spool_path),
+                         lambda fp: shutil.copyfileobj(spool, fp, DEFLATE_CHUNK_SIZE))
+    os.unlink(spool_path)
+
+def copy_raw_member(zipf, zinfo, source, old_info):
+    # Copy the compressed bytes of an unchanged member from the previous archive as-is
+    source.fp.seek(old_info.header_offset)
+    header = source.fp.read(zipfile.sizeFileHeader)
+    name_length, extra_length = struct.unpack("<HH", header[26:30])  # Local header field sizes
+    source.fp.seek(name_length + extra_length, os.SEEK_CUR)
+    
+    def copy_payload(fp):
+        remaining = old_info.compress_size
+        while remaining:
+            chunk = source.fp.read(min(remaining, DEFLATE_CHUNK_SIZE))
+            fp.write(chunk)
+            remaining -= len(chunk)
+    
+    zinfo.compress_type = old_info.compress_type
+    write_raw_member(zipf, zinfo, old_info.CRC, old_info.compress_size, copy_payload)
+
+def write_zip_members(zip_name, members, workers=None, level=6, mode='w', reuse=None, source=None):
+    # members: (arcname, file_path, stat) tuples. Worker processes deflate members in parallel;
+    # this process is the single writer and appends them strictly in the order given.
+    # Members named in `reuse` (arcname -> ZipInfo of `source`) are copied without recompressing.
+    workers = workers or os.cpu_count()
+    reuse = reuse or {}
+    spool_dir = os.path.dirname(os.path.abspath(zip_name))  # Same filesystem as the archive
+    spool_prefix = f".{os.path.basename(zip_name)}."  # Recognised by archive_file_filter()
+    with zipfile.ZipFile(zip_name, mode, zipfile.ZIP_DEFLATED, compresslevel=level) as zipf, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        
+        def write_next():
+            zinfo, file_path, job = pending.popleft()
+            if isinstance(job, zipfile.ZipInfo):
+                copy_raw_member(zipf, zinfo, source, job)
+            elif job is None:  # Stored member: no CPU work, stream it straight in
+                with open(file_path, 'rb') as src, zipf.open(zinfo, 'w') as dst:
+                    shutil.copyfileobj(src, dst, DEFLATE_CHUNK_SIZE)
+            else:
+                write_deflated_member(zipf, zinfo, *job.result())
+        
+        for arcname, file_path, st in members:
+            zinfo = zip_info_for(arcname, st, compress_type_for(file_path))
+            job = reuse.get(zinfo.filename)
+            if job is None and zinfo.compress_type == zipfile.ZIP_DEFLATED:
+                job = pool.submit(deflate_member, file_path, level, spool_dir, spool_prefix)
+            pending.append((zinfo, file_path, job))
+            if len(pending) >= 4 * workers:  # Bounded read-ahead keeps spool usage in check
+                write_next()
+        while pending:
+            write_next()
+        return zipf.infolist()
+
+def manifest_path(zip_name):
+    return f"{zip_name}.manifest.json"
+
+def load_manifest(zip_name):
+    try:
+        with open(manifest_path(zip_name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}  # No (readable) manifest: the next update is a full build
+
+def save_manifest(zip_name, infos, members):
+    # arcname -> [size, mtime_ns, CRC] for every member of the archive just written
+    stats = {arcname: st for arcname, _, st in members}
+    manifest = {info.filename: [stats[info.filename].st_size, stats[info.filename].st_mtime_ns, info.CRC]
+                for info in infos if info.filename in stats}
+    with atomic_writer(manifest_path(zip_name), 'w') as f:
+        json.dump(manifest, f, separators=(",", ":"))
+
+def update_zip(zip_name, members, workers=None, level=6, append=False):
+    manifest = load_manifest(zip_name)
+    if not manifest or not os.path.exists(zip_name):
+        infos = write_zip_members(zip_name, members, workers, level)
+        save_manifest(zip_name, infos, members)
+        return "rebuilt"
+    
+    with zipfile.ZipFile(zip_name) as source:
+        old_infos = {info.filename: info for info in source.infolist()}
+        # Unchanged: same size and mtime as recorded, and the archive still holds that CRC
+        unchanged = {}
+        for arcname, _, st in members:
+            info = old_infos.get(arcname)
+            if info is not None and manifest.get(arcname) == [st.st_size, st.st_mtime_ns, info.CRC]:
+                unchanged[arcname] = info
+        added = [member for member in members if member[0] not in old_infos]
+        if not added and len(unchanged) == len(old_infos):
+            return "unchanged"  # Leaving the file alone is byte-identical to a rebuild
+        
+        if append and len(unchanged) == len(old_infos):
+            # Only new files: deflate just those and append them after the existing members
+            source.close()
+            infos = write_zip_members(zip_name, added, workers, level, mode='a')
+            status = "appended"
+        else:
+            # Changed or deleted members: rewrite, copying unchanged compressed bytes verbatim,
+            # then swap the new archive in atomically
+            tmp_name = f"{zip_name}.tmp"
+            infos = write_zip_members(tmp_name, members, workers, level, reuse=unchanged, source=source)
+            os.replace(tmp_name, zip_name)
+            status = "rewritten"
+    save_manifest(zip_name, infos, members)
+    return status
+
+def archive_file_filter(zip_name):
+    # Predicate for the archive's own files, so one written inside the directory it archives
+    # never ends up containing itself, not even on an incremental rerun: the zip, its manifest,
+    # the rewrite's .tmp, and the ".<zip name>.*" spools and manifest temp files next to it.
+    # Names are checked first; only a candidate pays for the realpath comparison.
+    name = os.path.basename(zip_name)
+    directory = os.path.realpath(os.path.dirname(os.path.abspath(zip_name)))
+    names = {name, os.path.basename(manifest_path(zip_name)), f"{name}.tmp"}
+    
+    def is_archive_file(path):
+        head, tail = os.path.split(path)
+        return ((tail in names or tail.startswith(f".{name}."))
+                and os.path.realpath(head or os.curdir) == directory)
+    return is_archive_file
+
+def zip_directory(directory, zip_name, workers=None, level=6, incremental=False, append=False):
+    # Snapshot and sort the listing first, so the member order does not depend on scandir order
+    is_archive_file = archive_file_filter(zip_name)
+    members = sorted((os.path.relpath(entry.path, directory).replace(os.sep, "/"), entry.path, entry.stat())
+                     for entry in scan_tree(directory) if not is_archive_file(entry.path))
+    if incremental:
+        # Driven by <zip_name>.manifest.json: untouched, appended to, or rewritten reusing members
+        return update_zip(zip_name, members, workers, level, append)
+    write_zip_members(zip_name, members, workers, level)
+    return len(members)
 
 # Example usage
-zip_directory("/path/to/directory", "archive.zip")
+count = zip_directory("/path/to/directory", "archive.zip", workers=16)
+print(f"Added {count} files to archive.zip")
+
+# Nightly job: only new or changed files are compressed again
+print(zip_directory("/path/to/directory", "nightly.zip", incremental=True))
 
     Find the largest files in a directory:
 
@@ -189,104 +1324,523 @@ import os
 import heapq
 
 def find_largest_files(directory, n=10):
-    file_sizes = []
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            file_path = os.path.join(root, file)
-            file_size = os.path.getsize(file_path)
-            heapq.heappush(file_sizes, (-file_size, file_path))  # Use negative size for max-heap
-
-    return [heapq.heappop(file_sizes) for _ in range(min(n, len(file_sizes)))]
+    # nlargest keeps a bounded heap of n items instead of pushing every file
+    largest = heapq.nlargest(n, ((entry.stat().st_size, entry.path) for entry in scan_tree(directory)))
+    return [(-file_size, path) for file_size, path in largest]  # Negative sizes, largest first
 
 # Example usage
 for size, path in find_largest_files("/path/to/search", n=5):
     print(f"{path}: {-size / 1024 / 1024:.2f} MB")
 
-    Recursively change file permissions:
+    One-pass disk usage analyzer (top files, directory totals, extensions, histogram):
 
 python
 
 import os
+import sys
+import json
+import heapq
+import bisect
+from collections import Counter
+
+# Upper bounds of the size histogram buckets; the last bucket is open-ended
+HISTOGRAM_BOUNDS = (0, 1024, 16 * 1024, 256 * 1024, 1024 ** 2, 16 * 1024 ** 2, 256 * 1024 ** 2, 1024 ** 3)
+HISTOGRAM_LABELS = ("0 B", "<= 1 KiB", "<= 16 KiB", "<= 256 KiB", "<= 1 MiB", "<= 16 MiB",
+                    "<= 256 MiB", "<= 1 GiB", "> 1 GiB")
+
+def push_bounded(heap, k, item):
+    # Keep only the k largest items: a min-heap whose root is the smallest survivor
+    if k <= 0:
+        return
+    if len(heap) < k:
+        heapq.heappush(heap, item)
+    elif item > heap[0]:
+        heapq.heapreplace(heap, item)
+
+def analyze_disk_usage(directory, top=10, top_dirs=10, dir_depth=1):
+    # A single post-order walk. The stack holds one frame per directory level (its remaining
+    # listing and running totals), and a finished directory is folded into its parent, so
+    # cumulative sizes need no second crawl and no table of every directory.
+    # Totals are apparent sizes ("bytes") and allocated space ("disk_bytes", like du);
+    # hardlinked files are counted once.
+    largest_files, largest_dirs = [], []  # Bounded heaps, O(top) memory
+    shallow_dirs = {}  # Totals of directories at most dir_depth levels below the root
+    extensions = {}  # ".ext" -> [files, bytes]
+    histogram = [0] * len(HISTOGRAM_LABELS)
+    seen_inodes = set()  # Only files with st_nlink > 1 are remembered
+    errors = 0
+    
+    root = os.fspath(directory)
+    stack = [[root, 0, iter(scan_dir(root)), 0, 0, 0]]  # path, depth, entries, files, bytes, disk_bytes
+    while stack:
+        frame = stack[-1]
+        entry = next(frame[2], None)
+        if entry is None:  # Directory finished: record it and fold it into its parent
+            path, depth, _, files, size, disk_size = stack.pop()
+            push_bounded(largest_dirs, top_dirs, (size, path))
+            if depth <= dir_depth:
+                shallow_dirs[path] = {"files": files, "bytes": size, "disk_bytes": disk_size}
+            if stack:
+                parent = stack[-1]
+                parent[3] += files
+                parent[4] += size
+                parent[5] += disk_size
+            continue
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append([entry.path, frame[1] + 1, iter(scan_dir(entry.path)), 0, 0, 0])
+                continue
+            if not entry.is_file(follow_symlinks=False):
+                continue  # Symlinks, sockets, devices
+            st = entry.stat(follow_symlinks=False)  # Cached from the listing's d_type pass
+        except OSError:
+            errors += 1
+            continue
+        if st.st_nlink > 1:
+            if (st.st_dev, st.st_ino) in seen_inodes:
+                continue
+            seen_inodes.add((st.st_dev, st.st_ino))
+        size = st.st_size
+        frame[3] += 1
+        frame[4] += size
+        frame[5] += st.st_blocks * 512
+        push_bounded(largest_files, top, (size, entry.path))
+        ext = os.path.splitext(entry.name)[1].lower() or "(none)"
+        counts = extensions.setdefault(ext, [0, 0])
+        counts[0] += 1
+        counts[1] += size
+        histogram[bisect.bisect_left(HISTOGRAM_BOUNDS, size)] += 1
+    
+    root_totals = shallow_dirs.get(root, {"files": 0, "bytes": 0, "disk_bytes": 0})
+    return {  # Plain dicts and lists, ready for json.dump
+        "root": root,
+        **root_totals,
+        "errors": errors,
+        "largest_files": [{"path": path, "bytes": size} for size, path in sorted(largest_files, reverse=True)],
+        "largest_dirs": [{"path": path, "bytes": size} for size, path in sorted(largest_dirs, reverse=True)],
+        "directories": shallow_dirs,
+        "extensions": {ext: {"files": files, "bytes": size} for ext, (files, size)
+                       in sorted(extensions.items(), key=lambda item: -item[1][1])},
+        "histogram": dict(zip(HISTOGRAM_LABELS, histogram)),
+    }
+
+# Example usage: machine-readable report on stdout
+report = analyze_disk_usage("/path/to/analyze", top=20, dir_depth=2)
+json.dump(report, sys.stdout, indent=2)
+print(f"\n{report['files']} files, {report['bytes'] / 1024 ** 3:.2f} GiB "
+      f"({report['disk_bytes'] / 1024 ** 3:.2f} GiB on disk)")
+
+    Recursively change file permissions:
+
+python
 
-def change_permissions(directory, mode):
-    for root, dirs, files in os.walk(directory):
-        for dir_name in dirs:
-            os.chmod(os.path.join(root, dir_name), mode)
-        for file_name in files:
-            os.chmod(os.path.join(root, file_name), mode)
-            print(f"Changed permissions for: {os.path.join(root, file_name)}")
+import os
+import re
+import stat
+from collections import Counter
+
+# who -> (read, write, execute, set-id) bits
+WHO_BITS = {"u": (stat.S_IRUSR, stat.S_IWUSR, stat.S_IXUSR, stat.S_ISUID),
+            "g": (stat.S_IRGRP, stat.S_IWGRP, stat.S_IXGRP, stat.S_ISGID),
+            "o": (stat.S_IROTH, stat.S_IWOTH, stat.S_IXOTH, 0)}
+
+def parse_mode(mode):
+    # An int or octal string sets the mode outright; otherwise chmod-style symbolic clauses
+    # such as "u+rwX,go-w", "a=r" or "g=u" (copy another class's bits). Returns
+    # f(current_mode, is_dir) -> new permission bits. A clause without who ("+x") applies to
+    # everyone, without applying the umask as chmod(1) does.
+    if isinstance(mode, int) or re.fullmatch(r"[0-7]{1,4}", mode):
+        value = mode if isinstance(mode, int) else int(mode, 8)
+        return lambda current, is_dir: value
+    clauses = []
+    for clause in mode.split(","):
+        match = re.fullmatch(r"([ugoa]*)((?:[-+=](?:[ugo]|[rwxXst]*))+)", clause)
+        if not match:
+            raise ValueError(f"Invalid mode: {mode!r}")
+        who = match.group(1).replace("a", "ugo") or "ugo"
+        for op, perms in re.findall(r"([-+=])([ugo]|[rwxXst]*)", match.group(2)):
+            clauses.append((who, op, perms))
+    
+    def apply(current, is_dir):
+        new = stat.S_IMODE(current)
+        for who, op, perms in clauses:
+            if perms in WHO_BITS:  # Copy clause: that class's current r/w/x bits
+                read, write, execute, _ = WHO_BITS[perms]
+                perms = "".join(flag for flag, bit in (("r", read), ("w", write), ("x", execute)) if new & bit)
+            bits = affected = 0
+            for w in who:
+                read, write, execute, set_id = WHO_BITS[w]
+                affected |= read | write | execute | set_id
+                bits |= ((read if "r" in perms else 0) | (write if "w" in perms else 0)
+                         | (execute if "x" in perms else 0) | (set_id if "s" in perms else 0))
+                if "X" in perms and (is_dir or new & 0o111):  # Execute only where it makes sense
+                    bits |= execute
+            if "o" in who:
+                affected |= stat.S_ISVTX  # chmod(1) clears sticky on "o=" / "a=", directories included
+                if "t" in perms:
+                    bits |= stat.S_ISVTX
+            if op == "+":
+                new |= bits
+            elif op == "-":
+                new &= ~bits
+            else:
+                if is_dir and "s" not in perms:
+                    affected &= ~(stat.S_ISUID | stat.S_ISGID)  # Like chmod(1): "=" keeps a directory's set-id bits
+                new = (new & ~affected) | bits
+        return new
+    return apply
+
+def chmod_tree(directory, file_mode=None, dir_mode=None):
+    # os.fwalk hands out an fd for every directory: each entry costs one fstatat() relative to
+    # it, and chmod() runs only when the permission bits actually differ, so an already-correct
+    # tree is only read. Symlinks are skipped (their mode is meaningless on Linux).
+    file_fn = parse_mode(file_mode) if file_mode is not None else None
+    dir_fn = parse_mode(dir_mode) if dir_mode is not None else None
+    counts = Counter()
+    
+    def update(name, dir_fd):
+        try:
+            st = os.stat(name, dir_fd=dir_fd, follow_symlinks=False)
+            is_dir = stat.S_ISDIR(st.st_mode)
+            fn = dir_fn if is_dir else file_fn
+            if fn is None or stat.S_ISLNK(st.st_mode):
+                return
+            new = fn(st.st_mode, is_dir)
+            if new == stat.S_IMODE(st.st_mode):
+                counts["unchanged"] += 1
+                return
+            os.chmod(name, new, dir_fd=dir_fd)
+            counts["changed"] += 1
+        except OSError:
+            counts["failed"] += 1
+    
+    if hasattr(os, "fwalk") and os.chmod in os.supports_dir_fd:
+        for _, dirnames, filenames, dir_fd in os.fwalk(directory):
+            for name in filenames:
+                update(name, dir_fd)
+            for name in dirnames:  # Subdirectories are chmodded before fwalk descends into them
+                update(name, dir_fd)
+    else:  # No fwalk (e.g. Windows): the same logic with full paths
+        for entry in scan_tree(directory, dirs=True):
+            update(entry.path, None)
+    return counts
+
+def change_permissions(directory, mode=None, file_mode=None, dir_mode=None):
+    # mode applies to both files and directories unless file_mode / dir_mode override it
+    counts = chmod_tree(directory, file_mode if file_mode is not None else mode,
+                        dir_mode if dir_mode is not None else mode)
+    print(f"Changed permissions for {counts['changed']} entries ({counts['unchanged']} already correct)")
+    return counts
 
 # Example usage (set read and execute permissions for owner, group, and others)
 change_permissions("/path/to/directory", 0o755)
 
+# Files rw-r--r--, directories rwxr-xr-x; the symbolic form keeps existing execute bits on files
+change_permissions("/path/to/directory", file_mode=0o644, dir_mode=0o755)
+change_permissions("/path/to/directory", "u+rwX,go-w")
+
     Find and replace text in multiple files:
 
 python
 
 import os
-import fileinput
-
-def find_replace_in_files(directory, find_text, replace_text, file_pattern="*"):
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if fnmatch.fnmatch(file, file_pattern):
-                file_path = os.path.join(root, file)
-                with fileinput.input(files=(file_path,), inplace=True) as f:
-                    for line in f:
-                        print(line.replace(find_text, replace_text), end='')
-                print(f"Processed: {file_path}")
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+REWRITE_CHUNK_SIZE = 1024 * 1024
+REGEX_OVERLAP = 64 * 1024  # Longest regex match (and lookbehind) the streaming rewrite sees across chunks
+REGEX_METACHARS = set(".^$*+?{}[]\\|()")
+def literal_matches(needle, replacement):
+    # bytes.find() runs in C; no regex machinery for plain-text needles
+    def matches(buffer, start, limit):
+        pos = buffer.find(needle, start)
+        while pos != -1 and pos < limit:
+            yield pos, pos + len(needle), replacement
+            pos = buffer.find(needle, pos + len(needle))
+    return matches
+
+def regex_matches(pattern, template):
+    def matches(buffer, start, limit):
+        # Searching from `start` rather than slicing keeps the bytes before it visible to ^, \b
+        # and lookbehinds, while \A and a non-MULTILINE ^ still only match at index 0
+        for match in pattern.finditer(buffer, start):
+            if match.start() >= limit:
+                break
+            yield match.start(), match.end(), match.expand(template)
+    return matches
+
+def stream_replace(src, dst, matches, overlap, lookbehind=0, chunk_size=REWRITE_CHUNK_SIZE):
+    # Fixed-size chunks; the last `overlap` bytes (characters, for text) of each buffer are
+    # carried into the next one so a match that straddles a chunk boundary is still found
+    # exactly once. Up to `lookbehind` already-written ones are carried as well, as context in front of `start`:
+    # a later buffer then never looks like the beginning of the file to anchors. Buffers are
+    # bytes or str, whichever src yields; with dst None it only reports whether anything matches.
+    count = 0
+    carry = src.read(0)  # b"" or "", matching what src yields
+    start = 0  # Where the unwritten part of carry begins
+    while True:
+        chunk = src.read(chunk_size)
+        buffer = carry + chunk
+        # Matches must start before limit; at EOF, past the end so an empty match there counts too
+        limit = len(buffer) - overlap if chunk else len(buffer) + 1
+        pos = start
+        for match_start, match_end, replacement in matches(buffer, start, limit):
+            if dst is None:
+                return 1
+            dst.write(buffer[pos:match_start])
+            dst.write(replacement)
+            pos = match_end
+            count += 1
+        keep = max(pos, limit)
+        if dst is not None:
+            dst.write(buffer[pos:keep])
+        context = max(0, keep - lookbehind)
+        carry, start = buffer[context:], keep - context
+        if not chunk:
+            return count
+
+def open_utf8(file_path):
+    # Decoded incrementally by the text layer, so a character split across chunks is never
+    # cut; surrogateescape carries undecodable bytes through the rewrite unchanged
+    return open(file_path, 'r', encoding='utf-8', errors='surrogateescape', newline='')
+
+def rewrite_file(file_path, find_text, replace_text, regex=False):
+    if not find_text:
+        return 0
+    if regex and (REGEX_METACHARS & set(find_text) or "\\" in replace_text):
+        # Regexes run on decoded text, as re.sub on str would: classes, \w, (?i) and . all
+        # see characters, not the bytes of their UTF-8 encoding
+        matches = regex_matches(re.compile(find_text), replace_text)
+        with open(file_path, 'rb') as f:
+            head = f.read(BINARY_SNIFF_SIZE)
+        if not head or b"\0" in head:
+            return 0  # Empty or binary: skipped, as the mmap pre-check below skips them
+        with open_utf8(file_path) as src:
+            if not stream_replace(src, None, matches, REGEX_OVERLAP, REGEX_OVERLAP):
+                return 0  # Stops at the first match; files without one are never written
+        with open_utf8(file_path) as src, atomic_writer(file_path, 'w', encoding='utf-8',
+                                                       errors='surrogateescape', newline='') as dst:
+            return stream_replace(src, dst, matches, REGEX_OVERLAP, REGEX_OVERLAP)
+    # Literal fast path on bytes (also taken for "regexes" without any metacharacters): UTF-8
+    # is self-synchronizing, so a byte match of an encoded needle is always a character match
+    find = find_text.encode('utf-8')
+    replace = replace_text.encode('utf-8')
+    # Cheap mmap pre-check that stops at the first hit: files without a match are never written
+    if next(search_mapped_file(file_path, compile_patterns([find])), None) is None:
+        return 0
+    with open(file_path, 'rb') as src, atomic_writer(file_path) as dst:
+        return stream_replace(src, dst, literal_matches(find, replace), len(find) - 1)
+
+def find_replace_in_files(directory, find_text, replace_text, file_pattern="*", regex=False, workers=4):
+    paths = [entry.path for entry in scan_tree(directory, include=file_pattern)]
+    total = 0
+    # Rewrites are I/O bound, so a thread pool overlaps the reads, fsyncs and renames
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for file_path, count in zip(paths, pool.map(
+                lambda path: rewrite_file(path, find_text, replace_text, regex), paths)):
+            if count:
+                total += count
+                print(f"Processed: {file_path} ({count} replacements)")
+    return total
 
 # Example usage
 find_replace_in_files("/path/to/search", "old_text", "new_text", "*.txt")
+find_replace_in_files("/path/to/search", r"version=(\d+)", r"version=\1.0", "*.cfg", regex=True)
 
     Create a file tree structure:
 
 python
 
 import os
-
-def print_directory_tree(directory):
-    def print_tree(dir_path, prefix=""):
-        contents = os.listdir(dir_path)
-        pointers = ["├── " if i < len(contents) - 1 else "└── " for i in range(len(contents))]
-        for pointer, name in zip(pointers, contents):
-            print(f"{prefix}{pointer}{name}")
-            full_path = os.path.join(dir_path, name)
-            if os.path.isdir(full_path):
-                extension = "│   " if pointer == "├── " else "    "
-                print_tree(full_path, prefix + extension)
-
+import heapq
+from itertools import islice
+
+def tree_sort_key(entry):
+    return (not entry.is_dir(follow_symlinks=False), entry.name)  # Directories first, then by name
+
+def tree_listing(path, sort=True, limit=None):
+    # (entries to show, number left out). With a limit only `limit` entries are ever held,
+    # even for a directory of millions of files: nsmallest keeps a bounded heap when sorting.
+    total = 0
+    try:
+        with os.scandir(path) as it:
+            if limit is None:
+                entries = sorted(it, key=tree_sort_key) if sort else list(it)
+                return entries, 0
+            
+            def counted():
+                nonlocal total
+                for entry in it:
+                    total += 1
+                    yield entry
+            
+            if sort:
+                entries = heapq.nsmallest(limit, counted(), key=tree_sort_key)
+            else:
+                entries = list(islice(counted(), limit))
+                total += sum(1 for _ in it)  # Count the rest without keeping it
+            return entries, total - len(entries)
+    except OSError:
+        return [], 0  # Unreadable directory: show it empty, like scan_dir
+
+def human_size(size):
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if size < 1024 or unit == "TiB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def iter_tree_lines(directory, max_depth=None, max_entries=None, sizes=False, sort=True):
+    # Yields the tree one line at a time. An explicit stack of (listing, prefix, depth) frames
+    # replaces recursion, so depth is limited by memory, not by the interpreter's recursion limit.
+    # sizes=True costs an extra crawl of the whole tree first, and a total is held for every
+    # directory within max_depth until its line is printed (about 300 bytes each): on huge trees,
+    # pass a max_depth with it.
+    root = os.fspath(directory)
+    dir_sizes = {}
+    if sizes:  # Directory totals come from one post-order pass before printing starts
+        depth = max_depth if max_depth is not None else float("inf")
+        dir_sizes = analyze_disk_usage(root, top=0, top_dirs=0, dir_depth=depth)["directories"]
+    
+    entries, hidden = tree_listing(root, sort, max_entries)
+    stack = [[iter(entries), len(entries), hidden, "", 1]]  # entries, remaining, hidden, prefix, depth
+    while stack:
+        frame = stack[-1]
+        entry = next(frame[0], None)
+        if entry is None:
+            if frame[2]:
+                yield f"{frame[3]}└── ... {frame[2]} more"
+            stack.pop()
+            continue
+        frame[1] -= 1
+        last = frame[1] == 0 and not frame[2]
+        prefix, depth = frame[3], frame[4]
+        is_dir = entry.is_dir(follow_symlinks=False)  # d_type, no stat
+        line = f"{prefix}{'└── ' if last else '├── '}{entry.name}"
+        if sizes:  # Each directory's total is dropped once printed
+            try:
+                size = dir_sizes.pop(entry.path)["bytes"] if is_dir else entry.stat(follow_symlinks=False).st_size
+                line += f" ({human_size(size)})"
+            except (KeyError, OSError):
+                pass
+        yield line
+        if is_dir and (max_depth is None or depth < max_depth):
+            entries, hidden = tree_listing(entry.path, sort, max_entries)
+            stack.append([iter(entries), len(entries), hidden, prefix + ("    " if last else "│   "), depth + 1])
+
+def print_directory_tree(directory, max_depth=None, max_entries=None, sizes=False, sort=True):
     print(f"Directory tree of {directory}:")
-    print_tree(directory)
+    for line in iter_tree_lines(directory, max_depth, max_entries, sizes, sort):
+        print(line)
 
 # Example usage
 print_directory_tree("/path/to/directory")
 
+# Huge trees: two levels, at most 50 entries per directory, sizes, listing order
+print_directory_tree("/path/to/huge", max_depth=2, max_entries=50, sizes=True, sort=False)
+
     Batch convert file encodings:
 
 python
 
 import os
 import codecs
+from functools import partial
+from collections import Counter
+from contextlib import ExitStack, nullcontext
+from concurrent.futures import ProcessPoolExecutor
+
+ENCODING_CHUNK_SIZE = 1024 * 1024  # Bytes decoded and re-encoded at a time
+# Longest BOMs first: the UTF-32-LE BOM starts with the UTF-16-LE one
+BOMS = ((codecs.BOM_UTF32_LE, "utf-32"), (codecs.BOM_UTF32_BE, "utf-32"), (codecs.BOM_UTF8, "utf-8-sig"),
+        (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+
+def sniff_encoding(head, fallback="latin-1"):
+    # Guess from the first block: a BOM decides it; otherwise UTF-8 (which covers ASCII) if the
+    # block decodes, else the fallback
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)  # May end mid-character
+        return "utf-8"
+    except UnicodeDecodeError:
+        return fallback
+
+def copy_prefix(src, dst, length):
+    # The first `length` bytes of src, in ENCODING_CHUNK_SIZE pieces: the prefix can be most of the file
+    src.seek(0)
+    while length > 0:
+        data = src.read(min(length, ENCODING_CHUNK_SIZE))
+        if not data:
+            break
+        dst.write(data)
+        length -= len(data)
+
+def transcode_file(file_path, source_encoding, target_encoding, errors="strict"):
+    # Transcode in ENCODING_CHUNK_SIZE pieces with incremental codecs, so memory stays flat;
+    # source_encoding=None sniffs it from the first block. Output goes to a temp file that
+    # replaces the original only once everything converted. Nothing is written while the
+    # output is byte-for-byte the input, so files already in the target encoding are left alone.
+    # Returns ("converted" or "unchanged", the source encoding used).
+    with open(file_path, 'rb') as src, ExitStack() as stack:
+        chunk = src.read(ENCODING_CHUNK_SIZE)
+        encoding = source_encoding or sniff_encoding(chunk)
+        decoder = codecs.getincrementaldecoder(encoding)(errors)
+        encoder = codecs.getincrementalencoder(target_encoding)(errors)
+        dst = None
+        identical = 0  # Length of the output prefix that equals the input
+        while True:
+            final = not chunk
+            data = encoder.encode(decoder.decode(chunk, final), final)
+            if dst is None:
+                src_pos = src.tell()
+                src.seek(identical)
+                if src.read(len(data)) == data:
+                    identical += len(data)
+                else:  # First difference: start the real output with the identical prefix
+                    dst = stack.enter_context(atomic_writer(file_path))
+                    copy_prefix(src, dst, identical)
+                src.seek(src_pos)
+            if dst is not None:
+                dst.write(data)
+            if final:
+                break
+            chunk = src.read(ENCODING_CHUNK_SIZE)
+        if dst is None and identical != os.fstat(src.fileno()).st_size:
+            dst = stack.enter_context(atomic_writer(file_path))  # Output is a strict prefix
+            copy_prefix(src, dst, identical)
+    return ("converted" if dst is not None else "unchanged"), encoding
 
 def convert_file_encoding(file_path, source_encoding, target_encoding):
-    with codecs.open(file_path, 'r', source_encoding) as source_file:
-        content = source_file.read()
-    
-    with codecs.open(file_path, 'w', target_encoding) as target_file:
-        target_file.write(content)
-
-def batch_convert_encoding(directory, source_encoding, target_encoding, file_pattern="*.txt"):
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if fnmatch.fnmatch(file, file_pattern):
-                file_path = os.path.join(root, file)
-                convert_file_encoding(file_path, source_encoding, target_encoding)
-                print(f"Converted: {file_path}")
+    return transcode_file(file_path, source_encoding, target_encoding)
+
+def _convert_job(path, source_encoding, target_encoding):
+    try:
+        return transcode_file(path, source_encoding, target_encoding)
+    except (OSError, UnicodeError, LookupError) as e:
+        return "failed", str(e)  # The original file is untouched
+
+def batch_convert_encoding(directory, source_encoding, target_encoding, file_pattern="*.txt", workers=1):
+    # Transcoding is CPU bound, so workers > 1 runs files in a process pool
+    paths = [entry.path for entry in scan_tree(directory, include=file_pattern)]
+    convert = partial(_convert_job, source_encoding=source_encoding, target_encoding=target_encoding)
+    counts = Counter()
+    with ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as pool:
+        results = pool.map(convert, paths, chunksize=64) if pool else map(convert, paths)
+        for path, (status, detail) in zip(paths, results):
+            counts[status] += 1
+            if status == "converted":
+                print(f"Converted: {path} ({detail} -> {target_encoding})")
+            elif status == "failed":
+                print(f"Failed: {path}: {detail}")
+    return counts
 
 # Example usage
 batch_convert_encoding("/path/to/convert", "utf-8", "ascii", "*.txt")
 
+# Sniff each file's encoding (BOM, UTF-8, else latin-1) and convert to UTF-8 on 8 processes
+print(batch_convert_encoding("/path/to/convert", None, "utf-8", "*.txt", workers=8))
+
     Find files modified within a date range:
 
 python
@@ -298,12 +1852,10 @@ def find_files_by_date_range(directory, start_date, end_date):
     start_timestamp = start_date.timestamp()
     end_timestamp = end_date.timestamp()
     
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            file_path = os.path.join(root, file)
-            mod_time = os.path.getmtime(file_path)
-            if start_timestamp <= mod_time <= end_timestamp:
-                yield file_path
+    for entry in scan_tree(directory):
+        mod_time = entry.stat().st_mtime
+        if start_timestamp <= mod_time <= end_timestamp:
+            yield entry.path
 
 # Example usage
 start = datetime(2023, 1, 1)
@@ -317,72 +1869,716 @@ python
 
 import os
 import shutil
+from collections import Counter
 from datetime import datetime
 
-def backup_files(source_dir, backup_dir):
+def latest_snapshot(backup_dir):
+    # backup_YYYYmmdd_HHMMSS names sort chronologically
+    snapshots = sorted(entry.path for entry in scan_tree(backup_dir, files=False, dirs=True,
+                                                         recursive=False)
+                       if entry.name.startswith("backup_"))
+    return snapshots[-1] if snapshots else None
+
+def snapshot_file(src_path, src_stat, dst_path, prev_path, verify_hash=False, cache=None,
+                  copy_function=shutil.copy2):
+    # rsync --link-dest: a file unchanged since the previous snapshot becomes a hardlink to it
+    if prev_path is not None:
+        try:
+            prev_stat = os.stat(prev_path)
+        except FileNotFoundError:
+            prev_stat = None
+        if (prev_stat is not None and prev_stat.st_size == src_stat.st_size
+                and prev_stat.st_mtime_ns == src_stat.st_mtime_ns):  # copy2 keeps mtime_ns
+            same = True
+            if verify_hash:  # Optional paranoia; a HashCache makes it nearly free on reruns
+                digest = cache.digest if cache is not None else (lambda path, st: hash_file(path))
+                same = digest(src_path, src_stat) == digest(prev_path, prev_stat)
+            if same:
+                try:
+                    os.link(prev_path, dst_path)
+                    return "linked"
+                except OSError:
+                    pass  # Too many links, or a filesystem without hardlinks: copy instead
+    copy_function(src_path, dst_path)  # Copy with metadata (shutil.copy2 or fast_copy2)
+    return "copied"
+
+def backup_files(source_dir, backup_dir, link_dest=False, verify_hash=False, cache=None, chunked=False,
+                 copy_function=shutil.copy2):
+    if chunked:
+        # Content-defined chunk store instead of a directory tree (see ChunkStore below)
+        snapshot, counts = ChunkStore(backup_dir).backup(source_dir)
+        print(f"Backed up {source_dir} as snapshot {snapshot}")
+        return counts
+    # link_dest=True hardlinks unchanged files against the latest snapshot (or pass a path)
+    prev_root = latest_snapshot(backup_dir) if link_dest is True else (link_dest or None)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     backup_root = os.path.join(backup_dir, f"backup_{timestamp}")
     
-    for root, dirs, files in os.walk(source_dir):
-        for file in files:
-            src_path = os.path.join(root, file)
-            rel_path = os.path.relpath(src_path, source_dir)
-            dst_path = os.path.join(backup_root, rel_path)
-            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
-            shutil.copy2(src_path, dst_path)  # Copy with metadata
+    counts = Counter()
+    created = set()  # Directories already made; saves a makedirs() stat per file
+    for entry in scan_tree(source_dir):
+        src_path = entry.path
+        rel_path = os.path.relpath(src_path, source_dir)
+        dst_path = os.path.join(backup_root, rel_path)
+        parent = os.path.dirname(dst_path)
+        if parent not in created:
+            os.makedirs(parent, exist_ok=True)
+            created.add(parent)
+        prev_path = os.path.join(prev_root, rel_path) if prev_root else None
+        result = snapshot_file(src_path, entry.stat(), dst_path, prev_path, verify_hash, cache,
+                               copy_function)
+        counts[result] += 1
+        if result == "copied":
+            counts["bytes_copied"] += entry.stat().st_size
             print(f"Backed up: {src_path} -> {dst_path}")
+    return counts
 
 # Example usage
 backup_files("/path/to/source", "/path/to/backups")
 
-    Remove duplicate lines from text files:
+# Daily snapshot: only changed files take space, everything else is a hardlink
+print(backup_files("/path/to/source", "/path/to/backups", link_dest=True))
+
+    Deduplicating chunk store for backups (content-defined chunking):
 
 python
 
 import os
+import json
+import random
+import hashlib
+from collections import Counter
+from datetime import datetime
 
-def remove_duplicate_lines(file_path):
-    with open(file_path, 'r') as file:
-        lines = file.readlines()
+# Chunk boundaries come from a rolling "gear" hash of the last ~30 bytes, not from offsets,
+# so an edit or insertion only changes the chunks around it and the rest deduplicate.
+CDC_MIN_SIZE = 16 * 1024
+CDC_MAX_SIZE = 256 * 1024
+CDC_MASK = 0xFFFF << 13  # 16 bits must be zero: one boundary every ~64 KiB on average
+CDC_WINDOW = 32  # Bytes hashed before the minimum size, so the hash is warmed up there
+_gear_rng = random.Random(0x47454152)  # Fixed seed: boundaries must be stable across runs
+GEAR = [_gear_rng.getrandbits(29) for _ in range(256)]
+
+def find_cut(buffer):
+    end = min(len(buffer), CDC_MAX_SIZE)
+    pos = max(CDC_MIN_SIZE - CDC_WINDOW, 0)  # Nothing before the minimum size is a candidate
+    h = 0
+    gear = GEAR
+    for byte in buffer[pos:end]:
+        h = ((h << 1) + gear[byte]) & 0x3FFFFFFF  # Old bytes shift out after 30 steps
+        pos += 1
+        if not h & CDC_MASK:
+            return pos
+    return end
+
+def iter_chunks(f, read_size=1024 * 1024):
+    # Never holds more than CDC_MAX_SIZE + read_size bytes, whatever the file size
+    buffer = bytearray()
+    eof = False
+    while True:
+        while not eof and len(buffer) < CDC_MAX_SIZE:
+            block = f.read(read_size)
+            eof = not block
+            buffer += block
+        if not buffer:
+            return
+        cut = find_cut(buffer)
+        yield bytes(buffer[:cut])
+        del buffer[:cut]
+
+class ChunkStore:
+    # <store>/chunks/ab/abcd...  content-addressed chunks (sha256 of the chunk)
+    # <store>/snapshots/backup_YYYYmmdd_HHMMSS.json  per-snapshot manifest of files -> chunks
+    
+    def __init__(self, store_dir):
+        self.chunk_dir = os.path.join(store_dir, "chunks")
+        self.snapshot_dir = os.path.join(store_dir, "snapshots")
+        os.makedirs(self.chunk_dir, exist_ok=True)
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+    
+    def chunk_path(self, digest):
+        return os.path.join(self.chunk_dir, digest[:2], digest)
+    
+    def put_chunk(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.chunk_path(digest)
+        if os.path.exists(path):
+            return digest, False  # Already stored by this or an earlier snapshot
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with atomic_writer(path) as f:
+            f.write(data)
+        return digest, True
+    
+    def read_chunk(self, digest):
+        with open(self.chunk_path(digest), 'rb') as f:
+            data = f.read()
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Corrupt chunk {digest}")
+        return data
+    
+    def snapshots(self):
+        return sorted(entry.name[:-5] for entry in scan_tree(self.snapshot_dir, include="*.json",
+                                                              recursive=False))
+    
+    def load_snapshot(self, name):
+        with open(os.path.join(self.snapshot_dir, f"{name}.json")) as f:
+            return json.load(f)
     
-    unique_lines = list(dict.fromkeys(lines))  # Remove duplicates while preserving order
+    def delete_snapshot(self, name):
+        os.remove(os.path.join(self.snapshot_dir, f"{name}.json"))  # Run gc() to free its chunks
     
-    with open(file_path, 'w') as file:
-        file.writelines(unique_lines)
+    def backup(self, source_dir):
+        snapshots = self.snapshots()
+        previous = self.load_snapshot(snapshots[-1])["files"] if snapshots else {}
+        counts = Counter()
+        files = {}
+        for entry in scan_tree(source_dir):
+            st = entry.stat()
+            rel_path = os.path.relpath(entry.path, source_dir)
+            record = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "mode": st.st_mode}
+            old = previous.get(rel_path)
+            if old and (old["size"], old["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+                record["chunks"] = old["chunks"]  # Unchanged: reuse the chunk list unread
+                counts["files_reused"] += 1
+            else:
+                record["chunks"] = []
+                with open(entry.path, 'rb') as f:
+                    for data in iter_chunks(f):
+                        digest, stored = self.put_chunk(data)
+                        record["chunks"].append(digest)
+                        if stored:
+                            counts["new_chunks"] += 1
+                            counts["new_bytes"] += len(data)
+                counts["files_chunked"] += 1
+            files[rel_path] = record
+        
+        name = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        # The manifest is written last, so a crash mid-backup leaves no half snapshot behind
+        with atomic_writer(os.path.join(self.snapshot_dir, f"{name}.json"), 'w') as f:
+            json.dump({"source": os.path.abspath(source_dir), "files": files}, f)
+        return name, counts
+    
+    def restore(self, name, target_dir):
+        for rel_path, record in self.load_snapshot(name)["files"].items():
+            dst_path = os.path.join(target_dir, rel_path)
+            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+            with atomic_writer(dst_path) as f:
+                for digest in record["chunks"]:
+                    f.write(self.read_chunk(digest))
+            os.chmod(dst_path, record["mode"] & 0o7777)
+            os.utime(dst_path, ns=(record["mtime_ns"], record["mtime_ns"]))
+    
+    def gc(self):
+        # Mark every chunk any snapshot still references, then sweep the rest.
+        # Do not run it while a backup is in progress.
+        referenced = set()
+        for name in self.snapshots():
+            for record in self.load_snapshot(name)["files"].values():
+                referenced.update(record["chunks"])
+        removed = Counter()
+        for entry in scan_tree(self.chunk_dir):
+            if entry.name not in referenced:
+                removed["bytes"] += entry.stat().st_size
+                os.remove(entry.path)
+                removed["chunks"] += 1
+        return removed
+
+# Example usage
+store = ChunkStore("/path/to/chunk-store")
+snapshot, counts = store.backup("/path/to/vm-images")
+print(f"{snapshot}: {counts['new_chunks']} new chunks, {counts['new_bytes']} new bytes")
+store.restore(snapshot, "/path/to/restore")
+for old in store.snapshots()[:-7]:  # Keep the last seven snapshots
+    store.delete_snapshot(old)
+print(store.gc())
+
+    Remove duplicate lines from text files:
 
-def process_directory(directory):
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.endswith('.txt'):
-                file_path = os.path.join(root, file)
-                remove_duplicate_lines(file_path)
-                print(f"Processed: {file_path}")
+python
+
+import os
+import heapq
+import struct
+import hashlib
+import tempfile
+from array import array
+from functools import partial
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+
+DEDUP_MEMORY_LIMIT = 256 * 1024 * 1024  # Budget for the in-memory set of line hashes
+DEDUP_ENTRY_COST = 100  # Approximate bytes per set entry: a 16-byte digest object plus the slot
+DEDUP_RECORD = struct.Struct("16sQ")  # (line digest, byte offset of the line) in spill files
+DEDUP_SPILL_BUFFER = 64 * 1024  # Write buffer per partition file
+DEDUP_MAX_FANOUT = 1024  # Partition files open at once, whatever the budget
+
+def line_digest(line):
+    # 128-bit digests stand in for the lines; a false "duplicate" needs a blake2b collision
+    return hashlib.blake2b(line, digest_size=16).digest()
+
+def partition_of(digest, partitions, divisor=1):
+    # Equal lines share a partition. Each level of re-partitioning passes the product of the
+    # partition counts above it as divisor, so it splits on the next base-`partitions` digit.
+    return int.from_bytes(digest, 'little') // divisor % partitions
+
+def read_records(path):
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(DEDUP_RECORD.size * 4096)
+            if not data:
+                return
+            yield from DEDUP_RECORD.iter_unpack(data)
+
+def write_partitions(records, paths, divisor=1):
+    files = [open(path, 'wb', buffering=DEDUP_SPILL_BUFFER) for path in paths]
+    try:
+        for digest, offset in records:
+            files[partition_of(digest, len(paths), divisor)].write(DEDUP_RECORD.pack(digest, offset))
+    finally:
+        for f in files:
+            f.close()
+
+def first_occurrences(partition_path, start, max_entries):
+    # Sorted offsets >= start of lines whose digest first appears there; records are in file
+    # order, so the first record seen for a digest is its first occurrence. None if the
+    # partition holds more than max_entries distinct digests.
+    first = {}
+    for digest, offset in read_records(partition_path):
+        if digest not in first:
+            if len(first) >= max_entries:
+                return None
+            first[digest] = offset
+    return array('Q', sorted(offset for offset in first.values() if offset >= start))
+
+def resolve_partitions(paths, start, max_entries, fanout, divisor=1):
+    # Yields one file of sorted surviving offsets per partition. A partition with too many
+    # distinct lines for the budget is split again on further digest bits, not loaded whole.
+    for path in paths:
+        keep = first_occurrences(path, start, max_entries)
+        if keep is None:
+            subpaths = [f"{path}.{i}" for i in range(fanout)]
+            write_partitions(read_records(path), subpaths, divisor * len(paths))
+            os.remove(path)
+            yield from resolve_partitions(subpaths, start, max_entries, fanout, divisor * len(paths))
+            continue
+        os.remove(path)
+        keep_path = path + ".keep"
+        with open(keep_path, 'wb') as f:
+            keep.tofile(f)
+        yield keep_path
+
+def read_offsets(path, chunk_size):
+    with open(path, 'rb') as f:
+        while True:
+            chunk = array('Q')
+            chunk.frombytes(f.read(chunk_size))
+            if not chunk:
+                return
+            yield from chunk
+
+def merge_offsets(paths, memory_limit, fanin):
+    # Offsets merged across partitions come out in file order, which is the output order.
+    # Read-ahead is split from the budget; with more files than fanin, groups are merged into
+    # intermediate files first so no more than fanin are ever open.
+    while len(paths) > fanin:
+        merged = []
+        for i in range(0, len(paths), fanin):
+            group, merged_path = paths[i:i + fanin], f"{paths[i]}.merged"
+            chunk_size = max(8, memory_limit // (2 * len(group)) // 8 * 8)
+            with open(merged_path, 'wb') as f:
+                out = array('Q')
+                for offset in heapq.merge(*(read_offsets(path, chunk_size) for path in group)):
+                    out.append(offset)
+                    if len(out) >= DEDUP_SPILL_BUFFER // 8:
+                        out.tofile(f)
+                        del out[:]
+                out.tofile(f)
+            for path in group:
+                os.remove(path)
+            merged.append(merged_path)
+        paths = merged
+    chunk_size = max(8, memory_limit // (2 * max(1, len(paths))) // 8 * 8)
+    return heapq.merge(*(read_offsets(path, chunk_size) for path in paths))
+
+def dedupe_lines(file_path, memory_limit=DEDUP_MEMORY_LIMIT):
+    # Removes repeated lines, keeping each line's first occurrence in its original place.
+    # Lines are streamed: while the set of seen digests fits in memory_limit, unique lines go
+    # straight to the output. Past the budget, every digest (with its line's offset) is spilled
+    # to hash-partitioned temp files; each partition is then resolved on its own (split again
+    # if it is still too big), and a merge of the surviving offsets drives a second read of the
+    # rest of the file. Write buffers and merge read-ahead are sized to stay within the budget.
+    # Returns (lines read, lines written).
+    max_entries = max(1, memory_limit // DEDUP_ENTRY_COST)
+    fanout = max(2, min(DEDUP_MAX_FANOUT, memory_limit // (2 * DEDUP_SPILL_BUFFER)))
+    seen = set()
+    lines_in = lines_out = 0
+    with open(file_path, 'rb') as src, atomic_writer(file_path) as dst:
+        offset = 0
+        for line in src:
+            digest = line_digest(line)
+            lines_in += 1
+            if digest not in seen:
+                if len(seen) >= max_entries:
+                    break  # Over budget: the rest of the file goes through the partitions
+                seen.add(digest)
+                dst.write(line)
+                lines_out += 1
+            offset += len(line)
+        else:
+            return lines_in, lines_out
+        
+        lines_in -= 1  # The line that overflowed the set is read again below
+        spill_start = offset
+        # Enough partitions that one partition's records fit the budget, with headroom
+        remaining = os.fstat(src.fileno()).st_size - spill_start
+        estimated = remaining // max(1, spill_start // max(1, lines_in)) + len(seen)
+        partitions = min(fanout, max(2, 2 * estimated // max_entries + 1))
+        
+        def spilled_records():
+            nonlocal lines_in
+            # Digests already output go in as offset 0: they mark later copies as duplicates
+            yield from ((digest, 0) for digest in seen)
+            seen.clear()
+            src.seek(spill_start)
+            offset = spill_start
+            for line in src:
+                yield line_digest(line), offset
+                offset += len(line)
+                lines_in += 1
+        
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(file_path))) as spill_dir:
+            paths = [os.path.join(spill_dir, f"part{i:04d}") for i in range(partitions)]
+            write_partitions(spilled_records(), paths)
+            keep_paths = list(resolve_partitions(paths, spill_start, max_entries, fanout))
+            keep_offsets = merge_offsets(keep_paths, memory_limit, fanout)
+            next_keep = next(keep_offsets, None)
+            src.seek(spill_start)
+            offset = spill_start
+            for line in src:
+                if offset == next_keep:
+                    dst.write(line)
+                    lines_out += 1
+                    next_keep = next(keep_offsets, None)
+                offset += len(line)
+    return lines_in, lines_out
+
+def remove_duplicate_lines(file_path, memory_limit=DEDUP_MEMORY_LIMIT):
+    return dedupe_lines(file_path, memory_limit)
+
+def process_directory(directory, workers=1, memory_limit=DEDUP_MEMORY_LIMIT):
+    # Hashing lines is CPU bound, so files run in separate processes; each gets memory_limit
+    paths = [entry.path for entry in scan_tree(directory, include="*.txt")]
+    dedupe = partial(dedupe_lines, memory_limit=memory_limit)
+    with ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as pool:
+        results = pool.map(dedupe, paths) if pool else map(dedupe, paths)
+        for path, (lines_in, lines_out) in zip(paths, results):
+            print(f"Processed: {path} ({lines_in - lines_out} duplicate lines removed)")
 
 # Example usage
 process_directory("/path/to/process")
 
+# 50 GB logs: at most 64 MB of line hashes per file, four files at a time
+process_directory("/path/to/logs", workers=4, memory_limit=64 * 1024 * 1024)
+
     Generate a CSV report of file sizes:
 
 python
 
+import io
 import os
 import csv
-
-def generate_file_size_report(directory, output_file):
-    with open(output_file, 'w', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(['File Path', 'Size (bytes)'])
-        
-        for root, dirs, files in os.walk(directory):
-            for file in files:
-                file_path = os.path.join(root, file)
-                file_size = os.path.getsize(file_path)
-                writer.writerow([file_path, file_size])
-                print(f"Added to report: {file_path}")
+import sys
+import json
+import gzip
+import time
+from functools import lru_cache
+
+try:
+    import pwd
+except ImportError:  # Windows: owners are reported as numeric ids
+    pwd = None
+
+REPORT_BUFFER_SIZE = 1024 * 1024  # Bytes buffered before each write() syscall
+REPORT_BATCH_SIZE = 10000  # Rows handed to the writer at once
+
+@lru_cache(maxsize=None)
+def owner_name(uid):
+    # One getpwuid() per distinct owner, not per file
+    if pwd is not None:
+        try:
+            return pwd.getpwuid(uid).pw_name
+        except KeyError:
+            pass
+    return str(uid)
+
+# column -> (CSV header, value from the DirEntry and its stat result)
+REPORT_COLUMNS = {
+    "path": ("File Path", lambda entry, st: entry.path),
+    "size": ("Size (bytes)", lambda entry, st: st.st_size),
+    "mtime": ("Modified (epoch)", lambda entry, st: st.st_mtime),
+    "mode": ("Mode", lambda entry, st: f"{st.st_mode:o}"),
+    "inode": ("Inode", lambda entry, st: st.st_ino),
+    "owner": ("Owner", lambda entry, st: owner_name(st.st_uid)),
+}
+
+class ThrottledProgress:
+    # A single self-overwriting status line on stderr, redrawn at most every `interval` seconds
+    def __init__(self, label, interval=1.0):
+        self.label = label
+        self.interval = interval
+        self.count = 0
+        self.last = time.monotonic()
+    
+    def update(self, n=1):
+        self.count += n
+        if self.count % 1024 == 0:  # Don't even read the clock for every item
+            now = time.monotonic()
+            if now - self.last >= self.interval:
+                self.last = now
+                print(f"\r{self.label}: {self.count}", end="", file=sys.stderr, flush=True)
+    
+    def close(self):
+        print(f"\r{self.label}: {self.count}", file=sys.stderr)
+
+class ReportWriter:
+    # CSV or JSON Lines rows written in batches through a large buffer, gzipped when the name ends
+    # in .gz (or compress=True), and split into numbered parts every rotate_rows rows.
+    def __init__(self, output_file, columns, fmt=None, compress=None, rotate_rows=None,
+                 batch_size=REPORT_BATCH_SIZE):
+        self.output_file = os.fspath(output_file)
+        gz = self.output_file.endswith(".gz")
+        self.compress = gz if compress is None else compress
+        base, self.gz_suffix = (self.output_file[:-3], ".gz") if gz else (self.output_file, "")
+        self.fmt = fmt or ("jsonl" if base.endswith((".jsonl", ".ndjson")) else "csv")
+        self.stem, self.ext = os.path.splitext(base)
+        self.columns = list(columns)
+        self.rotate_rows = rotate_rows
+        self.batch_size = batch_size
+        self.batch = []
+        self.file = None
+        self.part_rows = 0
+        self.rows = 0
+        self.paths = []  # Every file written, in order
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def open_part(self):
+        if self.rotate_rows:
+            path = f"{self.stem}.{len(self.paths) + 1:05d}{self.ext}{self.gz_suffix}"
+        else:
+            path = self.output_file
+        if self.compress:
+            raw = io.BufferedWriter(gzip.GzipFile(path, 'wb', compresslevel=6), REPORT_BUFFER_SIZE)
+            self.file = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+        else:
+            self.file = open(path, 'w', newline='', encoding='utf-8', buffering=REPORT_BUFFER_SIZE)
+        self.paths.append(path)
+        self.part_rows = 0
+        if self.fmt == "csv":
+            self.csv_writer = csv.writer(self.file)
+            self.csv_writer.writerow([REPORT_COLUMNS[name][0] for name in self.columns])
+    
+    def write(self, row):
+        self.batch.append(row)
+        if len(self.batch) >= self.batch_size:
+            self.flush_batch()
+    
+    def flush_batch(self):
+        rows = self.batch
+        self.batch = []
+        while rows:
+            if self.file is None:
+                self.open_part()
+            room = self.rotate_rows - self.part_rows if self.rotate_rows else len(rows)
+            part, rows = rows[:room], rows[room:]
+            if self.fmt == "csv":
+                self.csv_writer.writerows(part)
+            else:
+                self.file.write("".join(json.dumps(dict(zip(self.columns, row))) + "\n" for row in part))
+            self.part_rows += len(part)
+            self.rows += len(part)
+            if self.rotate_rows and self.part_rows >= self.rotate_rows:
+                self.file.close()
+                self.file = None
+    
+    def close(self):
+        self.flush_batch()
+        if not self.paths:
+            self.open_part()  # Empty report: still write the file (and its CSV header)
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+def generate_file_size_report(directory, output_file, columns=("path", "size"), fmt=None,
+                              compress=None, rotate_rows=None, progress=True):
+    # columns: any of path, size, mtime, mode, inode, owner. Returns the files written.
+    getters = [REPORT_COLUMNS[name][1] for name in columns]
+    counter = ThrottledProgress("Files reported") if progress else None
+    with ReportWriter(output_file, columns, fmt, compress, rotate_rows) as report:
+        for entry in scan_tree(directory):
+            st = entry.stat()  # Cached from the walk
+            report.write([get(entry, st) for get in getters])
+            if counter:
+                counter.update()
+    if counter:
+        counter.close()
+    return report.paths
 
 # Example usage
 generate_file_size_report("/path/to/analyze", "file_sizes.csv")
 
+# Gzipped JSON Lines with ownership details, one file per million rows
+generate_file_size_report("/path/to/analyze", "inventory.jsonl.gz",
+                          columns=("path", "size", "mtime", "mode", "inode", "owner"),
+                          rotate_rows=1000000)
+
+    Delta transfer for large modified files (rsync algorithm):
+
+python
+
+import os
+import zlib
+import shutil
+import hashlib
+from collections import Counter
+
+DELTA_BLOCK_SIZE = 64 * 1024      # Granularity of matching against the old copy
+DELTA_READ_SIZE = 1024 * 1024     # Source read size; also caps the size of one literal run
+DELTA_MIN_SIZE = 8 * 1024 * 1024  # Smaller files are cheaper to just copy
+DELTA_MAX_ROLL = 8 * DELTA_BLOCK_SIZE  # Bytes rolled without a match before falling back to aligned checks
+ADLER_MOD = 65521
+
+def block_signatures(path, block_size=DELTA_BLOCK_SIZE):
+    # Weak checksum -> {strong checksum: offset} for every full block of the existing copy
+    signatures = {}
+    with open(path, 'rb') as f:
+        offset = 0
+        while True:
+            block = f.read(block_size)
+            if len(block) < block_size:
+                break  # A short tail block can't be matched by a full-size window
+            strong = hashlib.md5(block).digest()
+            signatures.setdefault(zlib.adler32(block), {}).setdefault(strong, offset)
+            offset += block_size
+    return signatures
+
+def file_delta(src_path, signatures, block_size=DELTA_BLOCK_SIZE):
+    # Yields ("copy", old_offset, length) for data already in the old copy and
+    # ("data", src_offset, length) for everything else, with adjacent runs merged.
+    # Aligned blocks are checked with zlib.adler32 in C; after a miss the window rolls one byte
+    # at a time (rsync's rolling Adler-32) so inserted or removed bytes don't hide later matches.
+    pending = None
+    
+    def emit(kind, offset, length):
+        nonlocal pending
+        if pending and pending[0] == kind and pending[1] + pending[2] == offset:
+            pending = (kind, pending[1], pending[2] + length)
+            return
+        if pending:
+            yield pending
+        pending = (kind, offset, length)
+    
+    with open(src_path, 'rb') as f:
+        buf = f.read(DELTA_READ_SIZE + block_size)
+        base = 0  # File offset of buf[0]
+        start = pos = 0  # buf[start:pos] is literal data not yet emitted
+        weak = None
+        rolled = 0
+        while True:
+            if len(buf) - pos <= block_size:  # Keep one byte beyond the window for rolling
+                more = f.read(DELTA_READ_SIZE)
+                if more:
+                    buf = buf[start:] + more
+                    base += start
+                    pos -= start
+                    start = 0
+                    continue
+                if len(buf) - pos < block_size:
+                    break  # Tail shorter than a block: literal
+            window_end = pos + block_size
+            if weak is None:
+                weak = zlib.adler32(buf[pos:window_end])
+            candidates = signatures.get(weak)
+            if candidates:
+                old_offset = candidates.get(hashlib.md5(buf[pos:window_end]).digest())
+                if old_offset is not None:
+                    if pos > start:
+                        yield from emit("data", base + start, pos - start)
+                    yield from emit("copy", old_offset, block_size)
+                    pos = start = window_end
+                    weak = None
+                    rolled = 0
+                    continue
+            if window_end == len(buf):
+                break  # Last full window didn't match
+            if rolled >= DELTA_MAX_ROLL:
+                pos = window_end  # Mostly new data: stop paying for per-byte rolling
+                weak = None
+            else:
+                a, b = weak & 0xffff, weak >> 16
+                out, new = buf[pos], buf[window_end]
+                a = (a - out + new) % ADLER_MOD
+                b = (b - block_size * out + a - 1) % ADLER_MOD
+                weak = (b << 16) | a
+                pos += 1
+                rolled += 1
+            if pos - start >= DELTA_READ_SIZE:  # Bound the literal run
+                yield from emit("data", base + start, pos - start)
+                start = pos
+    if len(buf) > start:
+        yield from emit("data", base + start, len(buf) - start)
+    if pending:
+        yield pending
+
+def copy_range(src, dst, offset, length):
+    src.seek(offset)
+    while length > 0:
+        chunk = src.read(min(length, DELTA_READ_SIZE))
+        if not chunk:
+            raise EOFError(f"{src.name} shrank during delta transfer")
+        dst.write(chunk)
+        length -= len(chunk)
+
+def delta_copy(src_path, dst_path, block_size=DELTA_BLOCK_SIZE, in_place=False):
+    # Update dst_path to match src_path, reusing every block of the existing copy that still
+    # matches. Returns byte counts of "matched" (reused) and "literal" (read from the source).
+    ops = list(file_delta(src_path, block_signatures(dst_path, block_size), block_size))
+    counts = Counter()
+    for kind, offset, length in ops:
+        counts["matched" if kind == "copy" else "literal"] += length
+    
+    # Appended logs and dumps rewritten in place keep every block at its old offset; then only
+    # the literal runs need writing. Not for hardlinked files: that would change the other names too.
+    output_offset = 0
+    aligned = True
+    for kind, offset, length in ops:
+        aligned = aligned and (kind == "data" or offset == output_offset)
+        output_offset += length
+    if in_place and aligned and os.stat(dst_path).st_nlink == 1:
+        with open(src_path, 'rb') as src, open(dst_path, 'r+b') as dst:
+            for kind, offset, length in ops:
+                if kind == "data":
+                    dst.seek(offset)
+                    copy_range(src, dst, offset, length)
+            dst.truncate(output_offset)
+            dst.flush()
+            os.fsync(dst.fileno())
+        counts["in_place"] = 1
+    else:
+        # Otherwise assemble the new file next to the old one and rename it over
+        with open(src_path, 'rb') as src, open(dst_path, 'rb') as old, atomic_writer(dst_path) as dst:
+            for kind, offset, length in ops:
+                copy_range(old if kind == "copy" else src, dst, offset, length)
+    shutil.copystat(src_path, dst_path)
+    return counts
+
+# Example usage: after appending to a 20 GB log, only the new tail is written
+print(delta_copy("/path/to/source/app.log", "/path/to/target/app.log", in_place=True))
+
     Synchronize two directories:
 
 python
@@ -390,30 +2586,138 @@ python
 import os
 import shutil
 import filecmp
-
-def sync_directories(source_dir, target_dir):
-    dcmp = filecmp.dircmp(source_dir, target_dir)
-    
-    # Copy files that don't exist in the target directory
-    for file in dcmp.left_only:
-        src_path = os.path.join(source_dir, file)
-        dst_path = os.path.join(target_dir, file)
-        if os.path.isfile(src_path):
-            shutil.copy2(src_path, dst_path)
-            print(f"Copied: {src_path} -> {dst_path}")
-        elif os.path.isdir(src_path):
-            shutil.copytree(src_path, dst_path)
-            print(f"Copied directory: {src_path} -> {dst_path}")
-    
-    # Update files that are different
-    for file in dcmp.diff_files:
-        src_path = os.path.join(source_dir, file)
-        dst_path = os.path.join(target_dir, file)
-        shutil.copy2(src_path, dst_path)
-        print(f"Updated: {dst_path}")
-    
-    # Recursively sync subdirectories
-    for subdir in dcmp.common_dirs:
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+SyncOp = namedtuple("SyncOp", "action rel_path size")  # action: mkdir, copy, update, touch, delete
+
+def build_manifest(root_dir):
+    # relative path -> DirEntry (with its cached stat) for every file and directory
+    if not os.path.isdir(root_dir):
+        return {}
+    return {os.path.relpath(entry.path, root_dir): entry for entry in scan_tree(root_dir, dirs=True)}
+
+def compare_files(src_entry, dst_entry, cache=None):
+    # "same", "update", or "touch" for equal content under a different mtime: copying the
+    # timestamps over then lets the next run's quick check pass without reading either file
+    src_stat, dst_stat = src_entry.stat(), dst_entry.stat()
+    if src_stat.st_size != dst_stat.st_size:
+        return "update"
+    if src_stat.st_mtime_ns == dst_stat.st_mtime_ns:
+        return "same"  # Same size and mtime counts as equal, like rsync's quick check
+    if cache is not None:  # A HashCache turns repeat comparisons into lookups
+        equal = cache.digest(src_entry.path, src_stat) == cache.digest(dst_entry.path, dst_stat)
+    else:
+        equal = filecmp.cmp(src_entry.path, dst_entry.path, shallow=False)
+    return "touch" if equal else "update"
+
+def plan_sync(source_dir, target_dir, cache=None, delete=True):
+    # Walk each side once, then diff the two manifests; nothing is touched here
+    source = build_manifest(source_dir)
+    target = build_manifest(target_dir)
+    plan = []
+    deleted_dirs = {}  # rel_path -> index of its delete op in the plan
+    
+    def deleted_ancestor(rel_path):
+        parent = os.path.dirname(rel_path)
+        while parent:
+            if parent in deleted_dirs:
+                return parent
+            parent = os.path.dirname(parent)
+        return None
+    
+    # Deletes first: target-only entries, and entries whose type differs from the source.
+    # Sorted order visits a directory before anything inside it.
+    for rel_path in sorted(target):
+        dst_entry, src_entry = target[rel_path], source.get(rel_path)
+        is_dir = dst_entry.is_dir(follow_symlinks=False)
+        ancestor = deleted_ancestor(rel_path)
+        if ancestor is not None:  # One rmtree covers it; just count its bytes
+            if not is_dir:
+                index = deleted_dirs[ancestor]
+                plan[index] = plan[index]._replace(size=plan[index].size + dst_entry.stat().st_size)
+            continue
+        if src_entry is not None and is_dir == src_entry.is_dir(follow_symlinks=False):
+            continue
+        if src_entry is None and not delete:
+            continue
+        if is_dir:
+            deleted_dirs[rel_path] = len(plan)
+        plan.append(SyncOp("delete", rel_path, 0 if is_dir else dst_entry.stat().st_size))
+    
+    for rel_path in sorted(source):
+        src_entry, dst_entry = source[rel_path], target.get(rel_path)
+        if dst_entry is not None and deleted_ancestor(rel_path) is not None:
+            dst_entry = None  # Its directory is being removed
+        if src_entry.is_dir(follow_symlinks=False):
+            if dst_entry is None or not dst_entry.is_dir(follow_symlinks=False):
+                plan.append(SyncOp("mkdir", rel_path, 0))
+        elif dst_entry is None or dst_entry.is_dir(follow_symlinks=False):
+            plan.append(SyncOp("copy", rel_path, src_entry.stat().st_size))
+        else:
+            action = compare_files(src_entry, dst_entry, cache)
+            if action != "same":
+                plan.append(SyncOp(action, rel_path, src_entry.stat().st_size if action == "update" else 0))
+    return plan
+
+def summarize_plan(plan):
+    totals = Counter()
+    for op in plan:
+        totals[op.action] += 1
+        totals[f"{op.action}_bytes"] += op.size
+    return totals
+
+def print_sync_plan(plan):
+    for op in plan:
+        print(f"{op.action:>6}  {op.rel_path}" + (f"  ({op.size} bytes)" if op.size else ""))
+    totals = summarize_plan(plan)
+    print(f"{totals['copy']} new ({totals['copy_bytes']} bytes), "
+          f"{totals['update']} updated ({totals['update_bytes']} bytes), "
+          f"{totals['delete']} deleted ({totals['delete_bytes']} bytes), "
+          f"{totals['mkdir']} directories created, {totals['touch']} timestamps refreshed")
+
+def run_sync_plan(plan, source_dir, target_dir, workers=4, delta_min_size=DELTA_MIN_SIZE, in_place=False,
+                  copy_function=shutil.copy2):
+    os.makedirs(target_dir, exist_ok=True)
+    copies = []
+    for op in plan:  # Deletes, mkdirs and touches are cheap metadata operations: do them in order
+        dst_path = os.path.join(target_dir, op.rel_path)
+        if op.action == "touch":
+            shutil.copystat(os.path.join(source_dir, op.rel_path), dst_path)
+        elif op.action == "delete":
+            if os.path.isdir(dst_path) and not os.path.islink(dst_path):
+                shutil.rmtree(dst_path)
+            else:
+                os.remove(dst_path)
+        elif op.action == "mkdir":
+            os.makedirs(dst_path, exist_ok=True)
+        else:
+            copies.append(op)
+    
+    def transfer(op):
+        src_path = os.path.join(source_dir, op.rel_path)
+        dst_path = os.path.join(target_dir, op.rel_path)
+        if op.action == "update" and op.size >= delta_min_size:
+            # Large changed file: rewrite only the blocks that differ (see delta_copy above)
+            return delta_copy(src_path, dst_path, in_place=in_place)
+        copy_file_atomic(src_path, dst_path, copy_function)
+        return Counter(literal=op.size)
+    
+    # Data copies go to a thread pool; the kernel does the copying, so threads overlap I/O
+    totals = summarize_plan(plan)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for counts in pool.map(transfer, copies):
+            totals["bytes_matched"] += counts["matched"]
+            totals["bytes_written"] += counts["literal"]
+    return totals
+
+def sync_directories(source_dir, target_dir, cache=None, delete=True, dry_run=False, workers=4,
+                     delta_min_size=DELTA_MIN_SIZE, in_place=False, copy_function=shutil.copy2):
+    plan = plan_sync(source_dir, target_dir, cache, delete)
+    if dry_run:
+        print_sync_plan(plan)
+        return summarize_plan(plan)
+    return run_sync_plan(plan, source_dir, target_dir, workers, delta_min_size, in_place, copy_function)
 
 Claude’s response was limited as it hit the maximum length allowed at this time. Claude does not have the ability to run the code it generates yet.
 R
@@ -426,13 +2730,9 @@ Certainly! I'll continue with the remaining examples.
 
 python
 
-    # Recursively sync subdirectories
-    for subdir in dcmp.common_dirs:
-        sync_directories(os.path.join(source_dir, subdir),
-                         os.path.join(target_dir, subdir))
-
-# Example usage
-sync_directories("/path/to/source", "/path/to/target")
+# Example usage: look at the plan and its byte totals first, then run it
+sync_directories("/path/to/source", "/path/to/target", dry_run=True)
+print(sync_directories("/path/to/source", "/path/to/target", workers=8, copy_function=fast_copy2))
 
     Find and delete files with specific patterns in their names:
 
@@ -440,22 +2740,422 @@ python
 
 import os
 import re
-
-def delete_files_by_pattern(directory, pattern):
-    compiled_pattern = re.compile(pattern)
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if compiled_pattern.search(file):
-                file_path = os.path.join(root, file)
-                os.remove(file_path)
-                print(f"Deleted: {file_path}")
+import stat
+import fnmatch
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+UNLINK_BATCH_SIZE = 1000  # Names per job in the parallel unlink pool
+UNLINK_QUEUE_PER_WORKER = 4  # Batches (each holding a dup'ed dir fd) in flight per worker
+
+def compile_name_matcher(patterns):
+    # Globs and "re:"-prefixed regexes (searched anywhere in the name) folded into one regex,
+    # so each name is tested once however many patterns there are
+    if not patterns:
+        return None
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    parts = [f"(?s:.*?(?:{p[3:]}))" if p.startswith("re:") else fnmatch.translate(p) for p in patterns]
+    return re.compile("|".join(parts)).match
+
+def unlink_batch(dir_fd, names):
+    failed = 0
+    try:
+        for name in names:
+            try:
+                os.unlink(name, dir_fd=dir_fd)
+            except OSError:
+                failed += 1
+    finally:
+        os.close(dir_fd)  # Each batch owns a dup() of its directory's fd
+    return failed
+
+def unlink_matching(directory, include=None, exclude=None, exclude_dirs=None, dry_run=False,
+                    workers=1, on_match=None):
+    # One fwalk pass: excluded directories are pruned before they are listed, names go through
+    # the compiled matchers, only matches are stat'ed (for the byte total), and deletion is
+    # unlink(name, dir_fd=...). With workers > 1, each directory's matches are unlinked in
+    # batches on a thread pool, which hides the round trips of cold network filesystems; the
+    # walk waits on the oldest batch once workers * UNLINK_QUEUE_PER_WORKER are queued, so open
+    # fds stay bounded however far fwalk could run ahead. POSIX only: os.fwalk needs dir_fd support.
+    include_match = compile_name_matcher(include)
+    if include_match is None:
+        raise ValueError("include must name at least one pattern; an empty filter would delete every file")
+    exclude_match = compile_name_matcher(exclude)
+    prune_match = compile_name_matcher(exclude_dirs)
+    counts = Counter()
+    pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 and not dry_run else None
+    futures = deque()
+    try:
+        for dirpath, dirnames, filenames, dir_fd in os.fwalk(directory):
+            if prune_match:
+                dirnames[:] = [name for name in dirnames if not prune_match(name)]  # Never entered
+            matched = []
+            for name in filenames:
+                if not include_match(name):
+                    continue
+                if exclude_match and exclude_match(name):
+                    continue
+                try:
+                    st = os.stat(name, dir_fd=dir_fd, follow_symlinks=False)
+                except OSError:
+                    continue  # Vanished since the listing
+                if stat.S_ISDIR(st.st_mode):
+                    continue
+                counts["matched"] += 1
+                counts["bytes"] += st.st_size
+                matched.append(name)
+                if on_match:
+                    on_match(os.path.join(dirpath, name))
+            if dry_run or not matched:
+                continue
+            if pool is None:
+                counts["failed"] += unlink_batch(os.dup(dir_fd), matched)
+            else:
+                for i in range(0, len(matched), UNLINK_BATCH_SIZE):  # fwalk closes dir_fd; jobs get a dup
+                    while len(futures) >= workers * UNLINK_QUEUE_PER_WORKER:
+                        counts["failed"] += futures.popleft().result()
+                    futures.append(pool.submit(unlink_batch, os.dup(dir_fd), matched[i:i + UNLINK_BATCH_SIZE]))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    counts["failed"] += sum(future.result() for future in futures)
+    if not dry_run:
+        counts["deleted"] = counts["matched"] - counts["failed"]
+    return counts
+
+def delete_files_by_pattern(directory, pattern=None, include=None, exclude=None, exclude_dirs=None,
+                            dry_run=False, workers=1):
+    # pattern: a regex searched in each file name, as before; include/exclude/exclude_dirs take
+    # any number of globs or "re:" regexes
+    include = ([f"re:{pattern}"] if pattern else []) + ([include] if isinstance(include, str) else list(include or []))
+    if not include:
+        raise ValueError("delete_files_by_pattern needs a pattern or include; refusing to delete every file")
+    report = (lambda path: print(f"Would delete: {path}")) if dry_run else None
+    counts = unlink_matching(directory, include, exclude, exclude_dirs, dry_run, workers, report)
+    verb = "Would delete" if dry_run else "Deleted"
+    print(f"{verb} {counts['deleted'] if not dry_run else counts['matched']} files "
+          f"({counts['bytes']} bytes), {counts['failed']} failed")
+    return counts
 
 # Example usage (delete all temporary files ending with .tmp)
 delete_files_by_pattern("/path/to/clean", r"\.tmp$")
 
+# Several patterns at once, never entering .git or node_modules; preview first
+delete_files_by_pattern("/path/to/clean", include=["*.tmp", "*.bak", "re:^core\\.\\d+$"],
+                        exclude=["keep*"], exclude_dirs=[".git", "node_modules"], dry_run=True)
+delete_files_by_pattern("/mnt/nfs/scratch", include=["*.tmp"], workers=16)
+
+    Live tree index with inotify (polling fallback):
+
+python
+
+import os
+import sys
+import math
+import stat
+import time
+import errno
+import select
+import bisect
+import struct
+import ctypes
+import ctypes.util
+import threading
+
+INDEX_BULK_MIN = 256  # Changes from which re-sorting the whole index beats one insort each
+POLL_INTERVAL = 30.0  # Seconds between polling walks...
+POLL_LOAD_FACTOR = 4  # ...and at least this many times as long as the last walk took
+
+# inotify(7) constants
+IN_MODIFY, IN_ATTRIB, IN_CLOSE_WRITE = 0x002, 0x004, 0x008
+IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x040, 0x080, 0x100, 0x200
+IN_Q_OVERFLOW, IN_IGNORED, IN_ONLYDIR, IN_ISDIR = 0x4000, 0x8000, 0x01000000, 0x40000000
+IN_NONBLOCK, IN_CLOEXEC = 0o4000, 0o2000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_ONLYDIR)
+INOTIFY_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len; then len bytes of NUL-padded name
+
+def load_inotify():
+    # libc's inotify functions through ctypes, or None where they don't exist (non-Linux)
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+class TreeIndex:
+    # path -> (size, mtime), plus two sorted lists so a date range or the top-n sizes are
+    # bisect lookups instead of a crawl. A single insort/del is a memmove of the list; large
+    # batches (the initial load, resyncs, whole directories) are merged with one sorted() instead.
+    
+    def __init__(self):
+        self.files = {}
+        self.by_mtime = []  # (mtime, path)
+        self.by_size = []  # (size, path)
+    
+    def __len__(self):
+        return len(self.files)
+    
+    def set(self, path, size, mtime):
+        old = self.files.get(path)
+        if old == (size, mtime):
+            return
+        if old is not None:
+            self.discard(path)
+        self.files[path] = (size, mtime)
+        bisect.insort(self.by_mtime, (mtime, path))
+        bisect.insort(self.by_size, (size, path))
+    
+    def discard(self, path):
+        old = self.files.pop(path, None)
+        if old is not None:
+            size, mtime = old
+            del self.by_mtime[bisect.bisect_left(self.by_mtime, (mtime, path))]
+            del self.by_size[bisect.bisect_left(self.by_size, (size, path))]
+    
+    def update(self, changes):
+        # changes: path -> (size, mtime), or None to drop the path
+        if len(changes) < INDEX_BULK_MIN:
+            for path, value in changes.items():
+                if value is None:
+                    self.discard(path)
+                else:
+                    self.set(path, *value)
+            return
+        stale, added = set(), []
+        for path, value in changes.items():
+            old = self.files.get(path)
+            if old == value:
+                continue
+            if old is not None:
+                stale.add(path)
+            if value is None:
+                self.files.pop(path, None)
+            else:
+                self.files[path] = value
+                added.append((path, value))
+        if stale:
+            self.by_mtime = [item for item in self.by_mtime if item[1] not in stale]
+            self.by_size = [item for item in self.by_size if item[1] not in stale]
+        # The kept entries are one sorted run, so timsort only sorts the new ones and merges
+        self.by_mtime = sorted(self.by_mtime + [(mtime, path) for path, (_, mtime) in added])
+        self.by_size = sorted(self.by_size + [(size, path) for path, (size, _) in added])
+    
+    def discard_tree(self, dir_path):
+        prefix = dir_path + os.sep
+        self.update({path: None for path in self.files if path.startswith(prefix)})
+    
+    def modified_between(self, start_timestamp, end_timestamp):
+        lo = bisect.bisect_left(self.by_mtime, (start_timestamp,))
+        hi = bisect.bisect_left(self.by_mtime, (math.nextafter(end_timestamp, math.inf),))
+        return [path for _, path in self.by_mtime[lo:hi]]
+    
+    def largest(self, n):
+        return [(-size, path) for size, path in reversed(self.by_size[-n:])] if n > 0 else []
+
+def snapshot_tree(root_dir):
+    # The polling fallback's view of the tree: one walk, stats cached on the DirEntry objects
+    snapshot = {}
+    for entry in scan_tree(root_dir):
+        try:
+            st = entry.stat()
+        except OSError:
+            continue
+        snapshot[entry.path] = (st.st_size, st.st_mtime)
+    return snapshot
+
+class TreeWatcher:
+    # Keeps a TreeIndex of root_dir current from inotify events on a background thread, so
+    # find_files_by_date_range / find_largest_files style queries are answered from memory.
+    # Without inotify (other platforms, or out of watches) it re-snapshots every `interval`
+    # seconds (longer if the walk itself is slow) and applies the difference instead.
+    # Only the watcher thread writes the index, so it reads it freely and takes the lock just
+    # to apply changes: walks and stats never block queries.
+    
+    def __init__(self, root_dir, interval=POLL_INTERVAL, use_inotify=True):
+        self.root_dir = os.path.abspath(root_dir)
+        self.interval = interval
+        self.index = TreeIndex()
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.watches = {}  # wd -> directory path
+        self.fd = None
+        self.libc = load_inotify() if use_inotify else None
+        self.thread = None
+    
+    def __enter__(self):
+        self.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    @property
+    def mode(self):
+        return "inotify" if self.fd is not None else "polling"
+    
+    def start(self):
+        if self.libc is not None:
+            fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0:
+                self.fd = fd
+        self.rescan()  # Watches go on before the walk, so nothing slips between the two
+        target = self.read_events if self.fd is not None else self.poll
+        self.thread = threading.Thread(target=target, name="tree-watcher", daemon=True)
+        self.thread.start()
+    
+    def close(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+    
+    # Queries, answered from the index
+    
+    def files_modified_between(self, start_date, end_date):
+        with self.lock:
+            return self.index.modified_between(start_date.timestamp(), end_date.timestamp())
+    
+    def largest_files(self, n=10):
+        with self.lock:
+            return self.index.largest(n)  # Same (-size, path) pairs as find_largest_files
+    
+    # Keeping the index current
+    
+    def add_watch(self, dir_path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dir_path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:  # fs.inotify.max_user_watches exhausted
+                raise OSError(err, "Out of inotify watches; raise fs.inotify.max_user_watches")
+            return  # Vanished already; its parent's DELETE event cleans up
+        self.watches[wd] = dir_path
+    
+    def scan_into_index(self, dir_path):
+        # Watch every directory of the subtree, then index its files
+        if self.fd is not None:
+            self.add_watch(dir_path)
+            for entry in scan_tree(dir_path, files=False, dirs=True):
+                self.add_watch(entry.path)
+        snapshot = snapshot_tree(dir_path)
+        with self.lock:
+            self.index.update(snapshot)
+    
+    def rescan(self):
+        # Full resync: first start, inotify queue overflow, or the polling fallback's tick
+        if self.fd is not None:
+            try:
+                self.add_watch(self.root_dir)
+                for entry in scan_tree(self.root_dir, files=False, dirs=True):
+                    self.add_watch(entry.path)  # Re-adding an existing watch returns its wd
+            except OSError:
+                os.close(self.fd)  # Not enough watches: fall back to polling
+                self.fd = None
+                self.watches.clear()
+        snapshot = snapshot_tree(self.root_dir)
+        changes = {path: None for path in self.index.files if path not in snapshot}
+        changes.update((path, value) for path, value in snapshot.items() if self.index.files.get(path) != value)
+        with self.lock:
+            self.index.update(changes)
+    
+    def refresh(self, paths):
+        changes = {}
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                changes[path] = None
+                continue
+            changes[path] = (st.st_size, st.st_mtime) if stat.S_ISREG(st.st_mode) else None
+        if changes:
+            with self.lock:
+                self.index.update(changes)
+    
+    def poll(self):
+        elapsed = 0.0
+        while not self.stopping.wait(max(self.interval, POLL_LOAD_FACTOR * elapsed)):
+            started = time.monotonic()
+            self.rescan()
+            elapsed = time.monotonic() - started
+    
+    def read_events(self):
+        while not self.stopping.is_set():
+            ready, _, _ = select.select([self.fd], [], [], 0.2)
+            if not ready:
+                continue
+            try:
+                data = os.read(self.fd, 256 * 1024)
+            except BlockingIOError:
+                continue
+            self.apply_events(data)
+            if self.fd is None:  # A resync ran out of watches and switched to polling
+                return self.poll()
+    
+    def apply_events(self, data):
+        touched = {}  # path -> None; a burst of writes to one file becomes a single stat
+        resync = False
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            name = data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b"\0")
+            offset += INOTIFY_EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                resync = True  # Events were lost: resync from disk once the batch is done
+                touched.clear()
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            dir_path = self.watches.get(wd)
+            if dir_path is None or not name:
+                continue
+            path = os.path.join(dir_path, os.fsdecode(name))
+            if not mask & IN_ISDIR:
+                touched[path] = None
+                continue
+            # Directory events are applied in order: a rename is MOVED_FROM then MOVED_TO
+            self.refresh(touched)
+            touched.clear()
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                with self.lock:
+                    self.index.discard_tree(path)
+                prefix = path + os.sep
+                for gone_wd in [w for w, p in self.watches.items() if p == path or p.startswith(prefix)]:
+                    self.libc.inotify_rm_watch(self.fd, gone_wd)
+                    del self.watches[gone_wd]
+            elif mask & (IN_CREATE | IN_MOVED_TO):
+                try:
+                    self.scan_into_index(path)  # Files created before the watch are found by the walk
+                except OSError:
+                    resync = True
+        self.refresh(touched)
+        if resync:
+            self.rescan()
+
+# Example usage: poll the index every minute instead of recrawling the tree
+import time
+from datetime import datetime
+
+with TreeWatcher("/path/to/search") as watcher:
+    print(f"Watching {len(watcher.index)} files ({watcher.mode})")
+    while True:
+        time.sleep(60)
+        for size, path in watcher.largest_files(5):
+            print(f"{path}: {-size / 1024 / 1024:.2f} MB")
+        for path in watcher.files_modified_between(datetime(2023, 1, 1), datetime.now()):
+            print(f"Found: {path}")
+
 These examples demonstrate advanced ways to use Python for file and directory operations. Here's a brief explanation of some key concepts used:
 
-    os.walk(): This function is used to recursively traverse directory trees. It yields a tuple containing the current directory path, a list of subdirectories, and a list of files in the current directory.
+    os.scandir() and scan_tree(): Every example walks the tree through one shared scandir-based walker. Each DirEntry knows whether it is a file or a directory from the directory listing itself (d_type) and caches its stat() result, so a file is stat'ed at most once per run, and include/exclude patterns prune the walk before anything is stat'ed.
     os.path module: This module provides functions for working with file paths, such as join(), splitext(), relpath(), etc.
     shutil module: This module offers high-level operations on files and collections of files, including functions like copy2(), move(), and copytree().
     re module: This module provides support for regular expressions, which are powerful tools for pattern matching and text manipulation.
@@ -489,6 +3189,25 @@ good now lets do the same with Pathlib add more detailed comment explanations
 
 Certainly! I'll provide you with 20 advanced examples using the pathlib module, which offers an object-oriented interface for working with file paths. I'll include detailed inline comments to explain each example.
 
+    Shared walker for the pathlib examples:
+
+python
+
+from pathlib import Path
+from typing import Iterator, Tuple
+import os
+
+def walk_paths(root_dir: str, **options) -> Iterator[Tuple[Path, os.DirEntry]]:
+    # Path.rglob() + is_file()/stat() costs extra syscalls per file; instead reuse the
+    # scandir walker from the os examples and wrap each entry in a Path.
+    # The DirEntry rides along so callers can use its cached stat() and d_type.
+    for entry in scan_tree(root_dir, **options):  # include/exclude/exclude_dirs/dirs/recursive
+        yield Path(entry.path), entry
+
+# Example usage
+for file_path, entry in walk_paths("/path/to/search", exclude_dirs=".git"):
+    print(file_path, entry.stat().st_size)
+
     Recursive search for files with a specific extension:
 
 python
@@ -496,11 +3215,9 @@ python
 from pathlib import Path
 
 def find_files_with_extension(root_dir: str, extension: str):
-    root_path = Path(root_dir)  # Convert string path to Path object
-    # Use glob to recursively search for files with the given extension
-    for file_path in root_path.rglob(f"*{extension}"):
-        if file_path.is_file():  # Ensure it's a file, not a directory
-            yield file_path  # Yield the Path object of the matching file
+    # The walker matches names before anything is stat'ed and only yields regular files
+    for file_path, _ in walk_paths(root_dir, include=f"*{extension}"):
+        yield file_path  # Yield the Path object of the matching file
 
 # Example usage
 for file_path in find_files_with_extension("/path/to/search", ".txt"):
@@ -515,13 +3232,17 @@ import re
 
 def rename_files_with_pattern(directory: str, pattern: str, replacement: str):
     dir_path = Path(directory)
-    for file_path in dir_path.iterdir():  # Iterate over directory contents
-        if file_path.is_file():  # Check if it's a file
-            new_name = re.sub(pattern, replacement, file_path.name)  # Apply regex substitution
-            if new_name != file_path.name:
-                new_path = file_path.with_name(new_name)  # Create new path with new name
-                file_path.rename(new_path)  # Rename the file
-                print(f"Renamed: {file_path.name} -> {new_name}")
+    compiled_pattern = re.compile(pattern)
+    mapping = {}
+    # Only the top-level files of the directory; d_type tells files apart without a stat
+    for file_path, _ in walk_paths(dir_path, recursive=False):
+        new_name = compiled_pattern.sub(replacement, file_path.name)  # Apply regex substitution
+        if new_name != file_path.name:
+            mapping[file_path.name] = new_name
+    # The whole mapping is checked for collisions, journaled, then renamed relative to a dir fd
+    bulk_rename(str(dir_path), mapping)
+    for name, new_name in mapping.items():
+        print(f"Renamed: {name} -> {new_name}")
 
 # Example usage: Change date format from YYYY_MM_DD to DD-MM-YYYY
 rename_files_with_pattern("/path/to/directory", r"(\d{4})_(\d{2})_(\d{2})", r"\3-\2-\1")
@@ -531,20 +3252,19 @@ rename_files_with_pattern("/path/to/directory", r"(\d{4})_(\d{2})_(\d{2})", r"\3
 python
 
 from pathlib import Path
-import hashlib
-
-def find_duplicates(directory: str):
-    dir_path = Path(directory)
-    hash_dict = {}
-    for file_path in dir_path.rglob("*"):  # Recursively iterate over all files
-        if file_path.is_file():
-            file_hash = hashlib.md5(file_path.read_bytes()).hexdigest()  # Calculate MD5 hash
-            if file_hash in hash_dict:
-                hash_dict[file_hash].append(str(file_path))
-            else:
-                hash_dict[file_hash] = [str(file_path)]
-    
-    return {k: v for k, v in hash_dict.items() if len(v) > 1}  # Return only duplicates
+from typing import Dict, List, Optional
+
+def find_duplicates(directory: str, stats: Optional[DuplicateScanStats] = None,
+                    algorithm: str = "md5", workers: int = 1, use_processes: bool = False,
+                    cache: Optional["HashCache"] = None) -> Dict[str, List[str]]:
+    # read_bytes() would load every file whole; the staged pipeline from the os example
+    # groups by size, then hashes 64 KiB at each end, and only then hashes whole files in chunks
+    # (spread over `workers` threads, or processes with use_processes=True)
+    entries = (entry for _, entry in walk_paths(directory))  # Recursively iterate over all files
+    duplicates = find_duplicate_groups(entries, stats, algorithm, workers, use_processes, cache)
+    if cache is not None:
+        cache.evict_missing(directory)  # Drop cached digests of files that no longer exist
+    return duplicates
 
 # Example usage
 duplicates = find_duplicates("/path/to/search")
@@ -559,20 +3279,24 @@ python
 
 from pathlib import Path
 import shutil
+from collections import Counter
 from datetime import datetime, timedelta
+from typing import Callable
 
-def move_old_files(source_dir: str, destination_dir: str, days_old: int):
+def move_old_files(source_dir: str, destination_dir: str, days_old: int,
+                   copy_function: Callable[[str, str], object] = shutil.copy2, workers: int = 4) -> Counter:
     source_path = Path(source_dir)
     dest_path = Path(destination_dir)
-    cutoff_date = datetime.now() - timedelta(days=days_old)
+    cutoff = (datetime.now() - timedelta(days=days_old)).timestamp()
     
-    for file_path in source_path.rglob("*"):  # Recursively iterate over all files
-        if file_path.is_file() and file_path.stat().st_mtime < cutoff_date.timestamp():
+    moves = []
+    for file_path, entry in walk_paths(source_path):  # Recursively iterate over all files
+        if entry.stat().st_mtime < cutoff:  # The walker's cached stat, not a fresh syscall
             relative_path = file_path.relative_to(source_path)  # Get relative path
-            new_path = dest_path / relative_path  # Construct new path
-            new_path.parent.mkdir(parents=True, exist_ok=True)  # Ensure destination directory exists
-            shutil.move(str(file_path), str(new_path))  # Move the file
-            print(f"Moved: {file_path} -> {new_path}")
+            moves.append((str(file_path), str(dest_path / relative_path)))
+    # One makedirs per destination directory, a rename when possible, and across devices
+    # copy_function (e.g. fast_copy2) plus unlink on `workers` threads; returns the counts
+    return move_files(moves, copy_function, workers)
 
 # Example usage
 move_old_files("/path/to/source", "/path/to/destination", 30)
@@ -583,18 +3307,19 @@ python
 
 from pathlib import Path
 import shutil
+from collections import Counter
+from typing import Callable
 
-def organize_by_extension(source_dir: str):
+def organize_by_extension(source_dir: str, copy_function: Callable[[str, str], object] = shutil.copy2,
+                          workers: int = 4) -> Counter:
     source_path = Path(source_dir)
-    for file_path in source_path.rglob("*"):  # Recursively iterate over all files
-        if file_path.is_file():
-            extension = file_path.suffix[1:]  # Get extension without dot
-            if extension:
-                dest_dir = source_path / extension  # Create Path for destination directory
-                dest_dir.mkdir(exist_ok=True)  # Create destination directory if it doesn't exist
-                new_path = dest_dir / file_path.name  # Construct new file path
-                shutil.move(str(file_path), str(new_path))  # Move the file
-                print(f"Moved: {file_path} -> {new_path}")
+    moves = []
+    # Snapshot the listing first, so files moved into the extension directories aren't revisited
+    for file_path, _ in walk_paths(source_path):  # Recursively iterate over all files
+        extension = file_path.suffix[1:]  # Get extension without dot
+        if extension:
+            moves.append((str(file_path), str(source_path / extension / file_path.name)))
+    return move_files(moves, copy_function, workers)
 
 # Example usage
 organize_by_extension("/path/to/organize")
@@ -605,12 +3330,14 @@ python
 
 from pathlib import Path
 
-def delete_empty_dirs(directory: str):
-    dir_path = Path(directory)
-    for path in sorted(dir_path.rglob("*"), key=lambda x: len(str(x)), reverse=True):
-        if path.is_dir() and not any(path.iterdir()):  # Check if directory is empty
-            path.rmdir()  # Remove empty directory
-            print(f"Deleted empty directory: {path}")
+def delete_empty_dirs(directory: str) -> int:
+    # Single bottom-up pass (remove_empty_dirs in the os examples): one listing per directory,
+    # emptiness propagated from children to parents, rmdir relative to the parent's fd
+    removed = 0
+    for dir_path in remove_empty_dirs(Path(directory)):
+        removed += 1
+        print(f"Deleted empty directory: {Path(dir_path)}")
+    return removed
 
 # Example usage
 delete_empty_dirs("/path/to/clean")
@@ -622,14 +3349,16 @@ python
 from pathlib import Path
 
 def batch_rename(directory: str, prefix: str, start_num: int = 1, padding: int = 3):
-    dir_path = Path(directory)
-    files = sorted(dir_path.iterdir())  # Get sorted list of directory contents
-    for i, file_path in enumerate(files, start=start_num):
-        if file_path.is_file():
-            new_name = f"{prefix}{str(i).zfill(padding)}{file_path.suffix}"
-            new_path = file_path.with_name(new_name)
-            file_path.rename(new_path)
-            print(f"Renamed: {file_path.name} -> {new_name}")
+    # Sorted list of directory contents; d_type from the walk answers is_file() below
+    files = sorted(walk_paths(directory, dirs=True, recursive=False))
+    mapping = {}
+    for i, (file_path, entry) in enumerate(files, start=start_num):
+        if entry.is_file():
+            mapping[file_path.name] = f"{prefix}{str(i).zfill(padding)}{file_path.suffix}"
+    # Renamed as one planned batch, so a new name never clobbers a file still waiting its turn
+    bulk_rename(directory, mapping)
+    for name, new_name in mapping.items():
+        print(f"Renamed: {name} -> {new_name}")
 
 # Example usage
 batch_rename("/path/to/rename", "file_", start_num=1, padding=3)
@@ -639,17 +3368,22 @@ batch_rename("/path/to/rename", "file_", start_num=1, padding=3)
 python
 
 from pathlib import Path
-
-def search_file_content(directory: str, search_text: str):
-    dir_path = Path(directory)
-    for file_path in dir_path.rglob("*"):  # Recursively iterate over all files
-        if file_path.is_file():
-            try:
-                content = file_path.read_text(encoding='utf-8')  # Read file content
-                if search_text in content:
-                    yield file_path
-            except (IOError, UnicodeDecodeError):
-                pass  # Skip files that can't be read or aren't text
+from typing import Iterator, List, Optional, Union
+
+def search_file_content(directory: str, search_text: Union[str, List[str]],
+                        index: Optional["TrigramIndex"] = None) -> Iterator[Path]:
+    # read_text() would load and decode every file; instead each file is memory-mapped and its
+    # bytes are scanned for all needles at once (see search_mapped_file in the os examples).
+    # Binary files are skipped after the first block.
+    matcher = compile_patterns(search_text)
+    if index is not None:
+        # A trigram index narrows the query to candidate files, which are then verified
+        candidates = map(Path, index.candidates(directory, search_text))
+    else:
+        candidates = (file_path for file_path, _ in walk_paths(directory))
+    for file_path in candidates:
+        if next(search_mapped_file(str(file_path), matcher), None) is not None:
+            yield file_path
 
 # Example usage
 for file_path in search_file_content("/path/to/search", "specific text"):
@@ -660,16 +3394,24 @@ for file_path in search_file_content("/path/to/search", "specific text"):
 python
 
 from pathlib import Path
-import zipfile
+from typing import Optional
 
-def zip_directory(directory: str, zip_name: str):
+def zip_directory(directory: str, zip_name: str, workers: Optional[int] = None, level: int = 6,
+                  incremental: bool = False, append: bool = False):
     dir_path = Path(directory)
-    with zipfile.ZipFile(zip_name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for file_path in dir_path.rglob("*"):  # Recursively iterate over all files
-            if file_path.is_file():
-                arcname = file_path.relative_to(dir_path)  # Get relative path for archive
-                zipf.write(file_path, arcname)
-                print(f"Added to zip: {file_path}")
+    is_archive_file = archive_file_filter(zip_name)  # The archive never archives itself
+    members = sorted(
+        (file_path.relative_to(dir_path).as_posix(), str(file_path), entry.stat())  # Relative path for archive
+        for file_path, entry in walk_paths(dir_path)  # Recursively iterate over all files
+        if not is_archive_file(entry.path)
+    )
+    if incremental:
+        # Compare against <zip_name>.manifest.json and recompress only new or changed files
+        return update_zip(zip_name, members, workers, level, append)
+    # Deflated in parallel worker processes, written in sorted order by one writer;
+    # already-compressed formats (jpg, zip, gz, mp4, ...) are stored without recompression
+    write_zip_members(zip_name, members, workers, level)
+    return len(members)
 
 # Example usage
 zip_directory("/path/to/directory", "archive.zip")
@@ -682,14 +3424,10 @@ from pathlib import Path
 import heapq
 
 def find_largest_files(directory: str, n: int = 10):
-    dir_path = Path(directory)
-    file_sizes = []
-    for file_path in dir_path.rglob("*"):  # Recursively iterate over all files
-        if file_path.is_file():
-            file_size = file_path.stat().st_size
-            heapq.heappush(file_sizes, (-file_size, str(file_path)))  # Use negative size for max-heap
-
-    return [heapq.heappop(file_sizes) for _ in range(min(n, len(file_sizes)))]
+    # Only the n largest (size, path) pairs are ever held in memory
+    largest = heapq.nlargest(n, ((entry.stat().st_size, str(file_path))  # Cached stat, one per file
+                                 for file_path, entry in walk_paths(directory)))
+    return [(-file_size, path) for file_size, path in largest]  # Negative sizes, largest first
 
 # Example usage
 for size, path in find_largest_files("/path/to/search", n=5):
@@ -708,12 +3446,19 @@ Certainly! I'll continue with the remaining examples using the pathlib module.
 python
 
 from pathlib import Path
-
-def change_permissions(directory: str, mode: int):
-    dir_path = Path(directory)
-    for path in dir_path.rglob("*"):  # Recursively iterate over all files and directories
-        path.chmod(mode)  # Change permissions
-        print(f"Changed permissions for: {path}")
+from collections import Counter
+from typing import Optional, Union
+
+def change_permissions(directory: str, mode: Union[int, str, None] = None,
+                       file_mode: Union[int, str, None] = None,
+                       dir_mode: Union[int, str, None] = None) -> Counter:
+    # Recursively over all files and directories with os.fwalk (chmod_tree in the os examples):
+    # dir_fd-relative stat and chmod, and no chmod at all where the mode is already right.
+    # Modes are octal ints or strings, or symbolic like "u+rwX,go-w".
+    counts = chmod_tree(Path(directory), file_mode if file_mode is not None else mode,
+                        dir_mode if dir_mode is not None else mode)
+    print(f"Changed permissions for {counts['changed']} entries ({counts['unchanged']} already correct)")
+    return counts
 
 # Example usage (set read and execute permissions for owner, group, and others)
 change_permissions("/path/to/directory", 0o755)
@@ -723,17 +3468,21 @@ change_permissions("/path/to/directory", 0o755)
 python
 
 from pathlib import Path
-import re
-
-def find_replace_in_files(directory: str, find_text: str, replace_text: str, file_pattern: str = "*"):
-    dir_path = Path(directory)
-    for file_path in dir_path.rglob(file_pattern):  # Recursively find files matching the pattern
-        if file_path.is_file():
-            content = file_path.read_text()  # Read file content
-            new_content = re.sub(find_text, replace_text, content)  # Replace text
-            if new_content != content:
-                file_path.write_text(new_content)  # Write updated content back to file
-                print(f"Processed: {file_path}")
+from concurrent.futures import ThreadPoolExecutor
+
+def find_replace_in_files(directory: str, find_text: str, replace_text: str, file_pattern: str = "*",
+                          workers: int = 4) -> int:
+    # Recursively find files matching the pattern
+    paths = [file_path for file_path, _ in walk_paths(directory, include=file_pattern)]
+    # find_text is a regex here (as with re.sub), but rewrite_file() takes the literal fast path
+    # when it has no metacharacters. Each file is streamed in chunks into a temp file that
+    # replaces the original atomically, and files without a match are left untouched.
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        counts = pool.map(lambda path: rewrite_file(str(path), find_text, replace_text, regex=True), paths)
+        changed = [(file_path, count) for file_path, count in zip(paths, counts) if count]
+    for file_path, count in changed:
+        print(f"Processed: {file_path}")
+    return sum(count for _, count in changed)
 
 # Example usage
 find_replace_in_files("/path/to/search", "old_text", "new_text", "*.txt")
@@ -743,22 +3492,18 @@ find_replace_in_files("/path/to/search", "old_text", "new_text", "*.txt")
 python
 
 from pathlib import Path
+from typing import Optional
 
-def print_directory_tree(directory: str):
+def print_directory_tree(directory: str, max_depth: Optional[int] = None, max_entries: Optional[int] = None,
+                         sizes: bool = False, sort: bool = True):
     dir_path = Path(directory)
-    
-    def print_tree(path: Path, prefix: str = ""):
-        entries = sorted(path.iterdir(), key=lambda p: (p.is_file(), p.name))
-        entries_count = len(entries)
-        for i, entry in enumerate(entries):
-            connector = "├── " if i < entries_count - 1 else "└── "
-            print(f"{prefix}{connector}{entry.name}")
-            if entry.is_dir():
-                extension = "│   " if i < entries_count - 1 else "    "
-                print_tree(entry, prefix + extension)
-
     print(f"Directory tree of {dir_path}:")
-    print_tree(dir_path)
+    # Streamed from an explicit-stack walk (iter_tree_lines in the os examples): no recursion
+    # limit, one listing per open level, and at most max_entries entries kept per directory.
+    # Directories come first unless sort=False, which prints in listing order. sizes=True adds
+    # a crawl up front and holds one total per directory within max_depth until it is printed.
+    for line in iter_tree_lines(dir_path, max_depth, max_entries, sizes, sort):
+        print(line)
 
 # Example usage
 print_directory_tree("/path/to/directory")
@@ -768,18 +3513,33 @@ print_directory_tree("/path/to/directory")
 python
 
 from pathlib import Path
-import codecs
-
-def convert_file_encoding(file_path: Path, source_encoding: str, target_encoding: str):
-    content = file_path.read_text(encoding=source_encoding)
-    file_path.write_text(content, encoding=target_encoding)
-
-def batch_convert_encoding(directory: str, source_encoding: str, target_encoding: str, file_pattern: str = "*.txt"):
-    dir_path = Path(directory)
-    for file_path in dir_path.rglob(file_pattern):  # Recursively find files matching the pattern
-        if file_path.is_file():
-            convert_file_encoding(file_path, source_encoding, target_encoding)
-            print(f"Converted: {file_path}")
+from functools import partial
+from collections import Counter
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+def convert_file_encoding(file_path: Path, source_encoding: Optional[str], target_encoding: str) -> Tuple[str, str]:
+    # Chunked incremental transcoding into a temp file and an atomic replace (transcode_file in
+    # the os examples); None sniffs the source encoding, and files already in the target are skipped
+    return transcode_file(str(file_path), source_encoding, target_encoding)
+
+def batch_convert_encoding(directory: str, source_encoding: Optional[str], target_encoding: str,
+                           file_pattern: str = "*.txt", workers: int = 1) -> Counter:
+    # Recursively find files matching the pattern
+    paths = [str(file_path) for file_path, _ in walk_paths(directory, include=file_pattern)]
+    convert = partial(_convert_job, source_encoding=source_encoding, target_encoding=target_encoding)
+    counts = Counter()
+    # With 100k files, a process pool spreads the decode/encode work over the cores
+    with ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as pool:
+        results = pool.map(convert, paths, chunksize=64) if pool else map(convert, paths)
+        for file_path, (status, detail) in zip(paths, results):
+            counts[status] += 1
+            if status == "converted":
+                print(f"Converted: {file_path} ({detail} -> {target_encoding})")
+            elif status == "failed":
+                print(f"Failed: {file_path}: {detail}")  # Left as it was
+    return counts
 
 # Example usage
 batch_convert_encoding("/path/to/convert", "utf-8", "ascii", "*.txt")
@@ -792,15 +3552,13 @@ from pathlib import Path
 from datetime import datetime
 
 def find_files_by_date_range(directory: str, start_date: datetime, end_date: datetime):
-    dir_path = Path(directory)
     start_timestamp = start_date.timestamp()
     end_timestamp = end_date.timestamp()
     
-    for file_path in dir_path.rglob("*"):  # Recursively iterate over all files
-        if file_path.is_file():
-            mod_time = file_path.stat().st_mtime
-            if start_timestamp <= mod_time <= end_timestamp:
-                yield file_path
+    for file_path, entry in walk_paths(directory):  # Recursively iterate over all files
+        mod_time = entry.stat().st_mtime
+        if start_timestamp <= mod_time <= end_timestamp:
+            yield file_path
 
 # Example usage
 start = datetime(2023, 1, 1)
@@ -814,21 +3572,39 @@ python
 
 from pathlib import Path
 import shutil
+from collections import Counter
 from datetime import datetime
-
-def backup_files(source_dir: str, backup_dir: str):
+from typing import Callable, Optional, Union
+
+def backup_files(source_dir: str, backup_dir: str, link_dest: Union[bool, str] = False,
+                 verify_hash: bool = False, cache: Optional["HashCache"] = None,
+                 chunked: bool = False, copy_function: Callable[[str, str], object] = shutil.copy2) -> Counter:
+    if chunked:
+        # Deduplicating content-defined chunk store; large, slightly changed files add few chunks
+        snapshot, counts = ChunkStore(backup_dir).backup(source_dir)
+        print(f"Backed up {source_dir} as snapshot {snapshot}")
+        return counts
     source_path = Path(source_dir)
     backup_path = Path(backup_dir)
+    # With link_dest, files unchanged since the previous snapshot (same size and mtime,
+    # optionally the same hash) are hardlinked into the new one instead of copied
+    prev_root = latest_snapshot(backup_path) if link_dest is True else (link_dest or None)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     backup_root = backup_path / f"backup_{timestamp}"
     
-    for file_path in source_path.rglob("*"):  # Recursively iterate over all files
-        if file_path.is_file():
-            rel_path = file_path.relative_to(source_path)
-            dst_path = backup_root / rel_path
-            dst_path.parent.mkdir(parents=True, exist_ok=True)  # Ensure destination directory exists
-            shutil.copy2(file_path, dst_path)  # Copy with metadata
+    counts = Counter()
+    for file_path, entry in walk_paths(source_path):  # Recursively iterate over all files
+        rel_path = file_path.relative_to(source_path)
+        dst_path = backup_root / rel_path
+        dst_path.parent.mkdir(parents=True, exist_ok=True)  # Ensure destination directory exists
+        prev_path = Path(prev_root) / rel_path if prev_root else None
+        result = snapshot_file(file_path, entry.stat(), dst_path, prev_path, verify_hash, cache,
+                               copy_function)  # fast_copy2 keeps the data copy in the kernel
+        counts[result] += 1
+        if result == "copied":
+            counts["bytes_copied"] += entry.stat().st_size
             print(f"Backed up: {file_path} -> {dst_path}")
+    return counts
 
 # Example usage
 backup_files("/path/to/source", "/path/to/backups")
@@ -838,18 +3614,24 @@ backup_files("/path/to/source", "/path/to/backups")
 python
 
 from pathlib import Path
-
-def remove_duplicate_lines(file_path: Path):
-    lines = file_path.read_text().splitlines()
-    unique_lines = list(dict.fromkeys(lines))  # Remove duplicates while preserving order
-    file_path.write_text("\n".join(unique_lines) + "\n")
-
-def process_directory(directory: str):
-    dir_path = Path(directory)
-    for file_path in dir_path.rglob("*.txt"):  # Recursively find all .txt files
-        if file_path.is_file():
-            remove_duplicate_lines(file_path)
-            print(f"Processed: {file_path}")
+from functools import partial
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple
+
+def remove_duplicate_lines(file_path: Path, memory_limit: int = DEDUP_MEMORY_LIMIT) -> Tuple[int, int]:
+    # Streams the file instead of read_text(): first occurrences are kept in order, line hashes
+    # beyond memory_limit spill to temp files, and the result replaces the file atomically
+    return dedupe_lines(str(file_path), memory_limit)
+
+def process_directory(directory: str, workers: int = 1, memory_limit: int = DEDUP_MEMORY_LIMIT):
+    paths = [str(file_path) for file_path, _ in walk_paths(directory, include="*.txt")]  # All .txt files
+    dedupe = partial(dedupe_lines, memory_limit=memory_limit)
+    # Several files at once in worker processes (line hashing holds the GIL)
+    with ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as pool:
+        results = pool.map(dedupe, paths) if pool else map(dedupe, paths)
+        for file_path, (lines_in, lines_out) in zip(paths, results):
+            print(f"Processed: {file_path} ({lines_in - lines_out} duplicate lines removed)")
 
 # Example usage
 process_directory("/path/to/process")
@@ -859,20 +3641,27 @@ process_directory("/path/to/process")
 python
 
 from pathlib import Path
-import csv
+from typing import List, Optional, Sequence
 
-def generate_file_size_report(directory: str, output_file: str):
+def generate_file_size_report(directory: str, output_file: str, columns: Sequence[str] = ("path", "size"),
+                              fmt: Optional[str] = None, compress: Optional[bool] = None,
+                              rotate_rows: Optional[int] = None, progress: bool = True) -> List[str]:
     dir_path = Path(directory)
     output_path = Path(output_file)
+    getters = [REPORT_COLUMNS[name][1] for name in columns]  # Extra columns: mtime, mode, inode, owner
+    counter = ThrottledProgress("Files reported") if progress else None  # Not one print() per file
     
-    with output_path.open('w', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(['File Path', 'Size (bytes)'])
-        
-        for file_path in dir_path.rglob("*"):  # Recursively iterate over all files
-            if file_path.is_file():
-                writer.writerow([str(file_path), file_path.stat().st_size])
-                print(f"Added to report: {file_path}")
+    # Rows are buffered and written in batches; .gz names are compressed, .jsonl names
+    # get JSON Lines, and rotate_rows splits the output into numbered parts
+    with ReportWriter(output_path, columns, fmt, compress, rotate_rows) as report:
+        for file_path, entry in walk_paths(dir_path):  # Recursively iterate over all files
+            st = entry.stat()
+            report.write([get(entry, st) for get in getters])
+            if counter:
+                counter.update()
+    if counter:
+        counter.close()
+    return report.paths
 
 # Example usage
 generate_file_size_report("/path/to/analyze", "file_sizes.csv")
@@ -883,25 +3672,28 @@ python
 
 from pathlib import Path
 import shutil
-import filecmp
+from collections import Counter
+from typing import Callable, Optional
 
-def sync_directories(source_dir: str, target_dir: str):
+def sync_directories(source_dir: str, target_dir: str, cache: Optional["HashCache"] = None,
+                     delete: bool = True, dry_run: bool = False, workers: int = 4,
+                     delta_min_size: int = DELTA_MIN_SIZE, in_place: bool = False,
+                     copy_function: Callable[[str, str], object] = shutil.copy2) -> Counter:
     source_path = Path(source_dir)
     target_path = Path(target_dir)
     
-    def sync(src: Path, dst: Path):
-        if src.is_file():
-            if not dst.exists() or not filecmp.cmp(str(src), str(dst)):
-                shutil.copy2(str(src), str(dst))
-                print(f"Copied: {src} -> {dst}")
-        elif src.is_dir():
-            if not dst.exists():
-                dst.mkdir(parents=True)
-                print(f"Created directory: {dst}")
-            for item in src.iterdir():
-                sync(item, dst / item.name)
-    
-    sync(source_path, target_path)
+    # Both trees are walked once into manifests and diffed into a plan of mkdir/copy/update/delete
+    # operations (see plan_sync in the os examples). Files count as equal when size and mtime
+    # match; otherwise their content is compared, through cached digests when a HashCache is given.
+    plan = plan_sync(str(source_path), str(target_path), cache, delete)
+    if dry_run:
+        print_sync_plan(plan)  # Every operation plus byte totals, nothing is changed
+        return summarize_plan(plan)
+    # Deletes and mkdirs run in order, file copies run on a pool of `workers` threads.
+    # Changed files of at least delta_min_size bytes go through delta_copy, which reuses the
+    # target's matching blocks and, with in_place=True, patches appended files without a rewrite.
+    return run_sync_plan(plan, str(source_path), str(target_path), workers, delta_min_size, in_place,
+                         copy_function)
 
 # Example usage
 sync_directories("/path/to/source", "/path/to/target")
@@ -911,15 +3703,25 @@ sync_directories("/path/to/source", "/path/to/target")
 python
 
 from pathlib import Path
-import re
-
-def delete_files_by_pattern(directory: str, pattern: str):
-    dir_path = Path(directory)
-    compiled_pattern = re.compile(pattern)
-    for file_path in dir_path.rglob("*"):  # Recursively iterate over all files
-        if file_path.is_file() and compiled_pattern.search(file_path.name):
-            file_path.unlink()  # Delete the file
-            print(f"Deleted: {file_path}")
+from collections import Counter
+from typing import Optional, Sequence
+
+def delete_files_by_pattern(directory: str, pattern: Optional[str] = None,
+                            include: Optional[Sequence[str]] = None, exclude: Optional[Sequence[str]] = None,
+                            exclude_dirs: Optional[Sequence[str]] = None, dry_run: bool = False,
+                            workers: int = 1) -> Counter:
+    # pattern is a regex searched in each file name; include/exclude/exclude_dirs take globs or
+    # "re:" regexes, all compiled into one matcher each. A single os.fwalk pass prunes excluded
+    # directories, deletes with dir_fd-relative unlink (on a thread pool when workers > 1),
+    # and totals the bytes; dry_run lists the matches instead.
+    include = ([f"re:{pattern}"] if pattern else []) + ([include] if isinstance(include, str) else list(include or []))
+    if not include:
+        raise ValueError("delete_files_by_pattern needs a pattern or include; refusing to delete every file")
+    report = (lambda path: print(f"Would delete: {Path(path)}")) if dry_run else None
+    counts = unlink_matching(Path(directory), include, exclude, exclude_dirs, dry_run, workers, report)
+    print(f"{'Would delete' if dry_run else 'Deleted'} {counts['matched'] if dry_run else counts['deleted']} "
+          f"files ({counts['bytes']} bytes), {counts['failed']} failed")
+    return counts
 
 # Example usage (delete all temporary files ending with .tmp)
 delete_files_by_pattern("/path/to/clean", r"\.tmp$")